@@ -3,6 +3,7 @@ Simple authentication script for local Telegram session
 """
 import os
 from telethon.sync import TelegramClient
+from telethon.sessions import SQLiteSession, StringSession
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,22 +12,71 @@ load_dotenv()
 api_id = int(os.getenv("API_ID"))
 api_hash = os.getenv("API_HASH")
 session_name = os.getenv("SESSION_NAME", "session")
+session_string = os.getenv("SESSION_STRING", "")
 
-print("🔐 Telegram Authentication")
-print("=" * 40)
 
-# Create client
-client = TelegramClient(session_name, api_id, api_hash)
+def tune_sqlite_session(session):
+    """Switch a SQLite-backed session to WAL mode with a larger page cache.
 
-# Connect and authenticate
-client.start()
+    WAL turns each session update into an append instead of a rewrite of the
+    database file, and synchronous=NORMAL defers the fsync to checkpoints.
+    String sessions are left untouched.
+    """
+    if not isinstance(session, SQLiteSession):
+        return
 
-# Get user info
-me = client.get_me()
-print(f"\n✅ Successfully authenticated!")
-print(f"👤 Name: {me.first_name} {me.last_name or ''}")
-print(f"📱 Phone: {me.phone}")
-print(f"💾 Session file: {session_name}.session")
-print("\n✨ You can now run the Streamlit app!")
+    # Telethon keeps its sqlite3 connection private; _cursor() opens it if needed
+    cursor = session._cursor()
+    try:
+        cursor.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA cache_size=-4096;"
+        )
+    finally:
+        cursor.close()
 
-client.disconnect()
+
+def main(session=None):
+    """Log in to Telegram and return the authorized session.
+
+    Args:
+        session: Session to authenticate (optional, defaults to SESSION_STRING
+            if set, otherwise the SESSION_NAME SQLite file)
+    """
+    if session is None:
+        # Prefer an in-memory string session over the SQLite file
+        session = StringSession(session_string) if session_string else session_name
+
+    print("🔐 Telegram Authentication")
+    print("=" * 40)
+
+    client = TelegramClient(session, api_id, api_hash)
+    tune_sqlite_session(client.session)
+
+    # Connect and authenticate - the context manager always disconnects
+    with client:
+        # Get user info (start() returns the client, not the user)
+        me = client.get_me()
+        print(f"\n✅ Successfully authenticated!")
+        print(f"👤 Name: {me.first_name} {me.last_name or ''}")
+        print(f"📱 Phone: {me.phone}")
+        if isinstance(client.session, StringSession):
+            print("💾 Session: in-memory string session")
+        else:
+            print(f"💾 Session file: {session_name}.session")
+
+        # Export the session whenever it differs from .env - a file session is
+        # only a bootstrap, and a revoked SESSION_STRING was just replaced by a
+        # fresh login that would otherwise be lost
+        new_session_string = StringSession.save(client.session)
+        if new_session_string != session_string:
+            print("\n🔑 Save this as SESSION_STRING in your .env:")
+            print(f"SESSION_STRING={new_session_string}")
+
+    return client.session
+
+
+if __name__ == "__main__":
+    main()
+    print("\n✨ You can now run the Streamlit app!")
@@ -1,13 +1,19 @@
 import asyncio
+import json
 import os
 import re
+import sqlite3
+import threading
 import time
 import zipfile
-import tempfile
-import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from pathlib import Path
+from types import SimpleNamespace
 from datetime import datetime
 from dotenv import load_dotenv
+import pandas as pd
 import streamlit as st
 from telethon import TelegramClient
 from telethon.sessions import StringSession
@@ -19,6 +25,11 @@ from telethon.tl.types import (
 from telethon.tl.functions.channels import GetForumTopicsRequest
 import nest_asyncio
 
+try:
+    import av  # Optional: PyAV remuxes in-process without spawning FFmpeg
+except ImportError:
+    av = None
+
 # Allow nested event loops for Streamlit
 nest_asyncio.apply()
 
@@ -31,16 +42,165 @@ api_hash = os.getenv("API_HASH")
 session_name = os.getenv("SESSION_NAME", "default_session")
 
 
-# Global client instance to avoid database locks
-_client_instance = None
-_client_lock = asyncio.Lock()
+@st.cache_resource
+def _async_runtime():
+    """Event loop and shared client that outlive a single script run.
+    
+    Streamlit re-executes this module on every interaction, so plain module
+    globals (and a fresh asyncio.run loop per click) would drop the connected
+    client each time.
+    """
+    loop = asyncio.new_event_loop()
+    nest_asyncio.apply(loop)
+    return SimpleNamespace(
+        loop=loop,
+        lock=threading.RLock(),  # Only one script thread drives the loop at a time
+        client=None,  # Global client instance to avoid database locks
+        client_task=None,  # In-flight (or finished) connection attempt
+    )
+
+
+def run_async(coro):
+    """Run a coroutine to completion on the shared event loop."""
+    runtime = _async_runtime()
+    with runtime.lock:
+        return runtime.loop.run_until_complete(coro)
 
 # FFmpeg path
 FFMPEG_PATH = str(Path(__file__).parent.parent / "ffmpeg" / "ffmpeg.exe")
+FFPROBE_PATH = str(Path(FFMPEG_PATH).with_name("ffprobe.exe"))
+
+# Local cache of fetched media listings, reused for incremental fetches
+FETCH_CACHE_PATH = "fetch_cache.db"
+
+# Translation tables for building safe file and folder names in one pass
+_FILENAME_SANITIZE = str.maketrans({c: '_' for c in '/\\:*?"<>|'})
+_TITLE_SANITIZE = str.maketrans({c: '_' for c in ' /\\:*?"<>|'})
+
+# Channel URL patterns, compiled once at import
+_RE_TME_C = re.compile(r't\.me/c/(\d+)(?:/(\d+))?')
+_RE_WEB = re.compile(r'web\.telegram\.org/[^#]*#(-?\d+)')
+_RE_TME = re.compile(r't\.me/([^/?]+)(?:/(\d+))?')
+_RE_ID = re.compile(r'^-?\d+$')
+
+# Document classification: (mime fragment, file extensions, type), checked in order
+_DOCUMENT_TYPES = (
+    ('video', frozenset({'.mp4', '.mkv', '.avi', '.mov', '.webm'}), 'Video'),
+    ('audio', frozenset({'.mp3', '.m4a', '.wav', '.ogg'}), 'Audio'),
+    ('application/pdf', frozenset({'.pdf'}), 'PDF'),
+    ('application/zip', frozenset({'.zip'}), 'ZIP'),
+)
+# Extension given to documents sent without a filename, by type
+_TYPE_EXTENSIONS = {'Video': '.mp4', 'Audio': '.mp3', 'PDF': '.pdf', 'ZIP': '.zip'}
+
+# 1024-based units for size and speed formatting
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+_SPEED_UNITS = ('B/s', 'KB/s', 'MB/s', 'GB/s', 'TB/s')
+_UNIT_DIVISORS = tuple(1 << (10 * i) for i in range(len(_SIZE_UNITS)))
+
+# Worker pool for video conversions so they overlap with ongoing downloads
+_convert_pool = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+
+# Parallel download settings for large documents
+DOWNLOAD_CHUNK_SIZE = 512 * 1024  # Largest request size Telethon allows
+PARALLEL_DOWNLOAD_MIN_SIZE = 10 * 1024 * 1024  # Smaller files use a single stream
+PARALLEL_DOWNLOAD_PARTS = 4  # Streams per file
+MAX_PARALLEL_REQUESTS = 8  # Streams in flight across all files (flood limits)
+PREALLOCATE_MIN_SIZE = 64 * 1024 * 1024  # Reserve disk blocks up front above this size
+ZIP_WRITE_BUFFER_SIZE = 1024 * 1024  # Buffer archive writes into 1 MiB disk writes
+ZIP_BUTTON_MAX_SIZE = 200 * 1024 * 1024  # Larger archives are not loaded into a download button
+
+# Formats that are already compressed - deflating them again costs CPU for ~0% gain
+_STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp4', '.mkv', '.mov', '.webm', '.avi', '.m4v',
+    '.mp3', '.m4a', '.ogg', '.oga', '.opus', '.aac', '.flac',
+    '.pdf', '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    '.apk', '.epub', '.docx', '.xlsx', '.pptx',
+})
+
+
+def _convert_with_pyav(input_path, output_path):
+    """Remux a video in-process with PyAV, transcoding audio only when needed.
+    
+    Video streams and AAC audio streams are copied packet-for-packet; any other
+    audio codec (e.g. Opus) is decoded and re-encoded to AAC at 192 kbps.
+    """
+    with av.open(str(input_path)) as in_container, \
+            av.open(str(output_path), 'w', format='mp4', options={'movflags': '+faststart'}) as out_container:
+        # PyAV 13+ renamed add_stream(template=...) to add_stream_from_template
+        add_copy_stream = getattr(out_container, 'add_stream_from_template', None) \
+            or (lambda stream: out_container.add_stream(template=stream))
+        
+        in_streams = []
+        out_streams = {}
+        transcoded = set()
+        for stream in in_container.streams:
+            if stream.type == 'video' or (stream.type == 'audio' and stream.codec_context.name == 'aac'):
+                out_streams[stream.index] = add_copy_stream(stream)
+            elif stream.type == 'audio':
+                out_stream = out_container.add_stream('aac', rate=stream.rate)
+                out_stream.bit_rate = 192000
+                out_streams[stream.index] = out_stream
+                transcoded.add(stream.index)
+            else:
+                continue
+            in_streams.append(stream)
+        
+        for packet in in_container.demux(in_streams):
+            # Skip the empty flush packets demux yields at end of stream
+            if packet.dts is None:
+                continue
+            
+            out_stream = out_streams[packet.stream.index]
+            if packet.stream.index in transcoded:
+                for frame in packet.decode():
+                    frame.pts = None
+                    out_container.mux(out_stream.encode(frame))
+            else:
+                packet.stream = out_stream
+                out_container.mux(packet)
+        
+        # Flush buffered audio out of the encoders
+        for index in transcoded:
+            out_container.mux(out_streams[index].encode(None))
+
+
+async def probe_audio_codec(input_path):
+    """Return the codec name of the first audio stream, or None if unknown."""
+    if not Path(FFPROBE_PATH).exists():
+        return None
+    
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            FFPROBE_PATH,
+            '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=codec_name',
+            '-of', 'csv=p=0',
+            str(input_path),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError:
+        return None
+    
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return None
+    
+    return stdout.decode('utf-8', errors='replace').strip() or None
 
 
-def convert_video_to_mp4(input_path, output_path=None, delete_original=True):
-    """Convert video with Opus codec to MP4 with AAC audio using FFmpeg.
+async def convert_video_to_mp4_async(input_path, output_path=None, delete_original=True):
+    """Convert video with Opus codec to MP4 with AAC audio.
+    
+    Uses PyAV on the conversion pool when it is installed, otherwise (or if
+    PyAV fails) runs the bundled FFmpeg executable as an async subprocess, so
+    other downloads keep running while a file converts.
     
     Args:
         input_path: Path to input video file
@@ -53,11 +213,6 @@ def convert_video_to_mp4(input_path, output_path=None, delete_original=True):
     try:
         input_path = Path(input_path)
         
-        # Check if FFmpeg exists
-        if not Path(FFMPEG_PATH).exists():
-            print(f"⚠️ FFmpeg not found at {FFMPEG_PATH}")
-            return str(input_path)
-        
         # Generate output path if not provided
         if output_path is None:
             output_path = input_path.with_suffix('.mp4')
@@ -70,45 +225,70 @@ def convert_video_to_mp4(input_path, output_path=None, delete_original=True):
         
         print(f"🔄 Converting {input_path.name} to MP4...")
         
-        # FFmpeg command to convert video
-        # -c:v copy: Copy video codec (no re-encoding for speed)
-        # -c:a aac: Convert audio to AAC codec
-        # -b:a 192k: Audio bitrate 192 kbps
-        # -y: Overwrite output file without asking
-        cmd = [
-            str(FFMPEG_PATH),
-            '-i', str(input_path),
-            '-c:v', 'copy',  # Copy video stream
-            '-c:a', 'aac',   # Convert audio to AAC
-            '-b:a', '192k',  # Audio bitrate
-            '-movflags', '+faststart',  # Optimize for streaming
-            '-y',  # Overwrite
-            str(output_path)
-        ]
-        
-        # Run FFmpeg with suppressed output
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=300  # 5 minute timeout
-        )
+        converted = False
+        if av is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(_convert_pool, _convert_with_pyav, input_path, output_path)
+                converted = output_path.exists()
+            except Exception as e:
+                print(f"⚠️ PyAV conversion failed, falling back to FFmpeg: {e}")
         
-        if result.returncode == 0 and output_path.exists():
-            print(f"✅ Converted to MP4: {output_path.name}")
+        if not converted:
+            # Check if FFmpeg exists
+            if not Path(FFMPEG_PATH).exists():
+                print(f"⚠️ FFmpeg not found at {FFMPEG_PATH}")
+                return str(input_path)
+            
+            # AAC audio only needs remuxing - anything else is re-encoded
+            if await probe_audio_codec(input_path) == 'aac':
+                audio_args = ['-c:a', 'copy']
+            else:
+                audio_args = ['-c:a', 'aac', '-b:a', '192k']
             
-            # Delete original if requested and different from output
-            if delete_original and input_path != output_path and input_path.exists():
-                input_path.unlink()
-                print(f"🗑️ Deleted original: {input_path.name}")
+            # FFmpeg command to convert video
+            # -c:v copy: Copy video codec (no re-encoding for speed)
+            # -c:a aac: Convert audio to AAC codec (192 kbps) unless it already is
+            # -y: Overwrite output file without asking
+            cmd = [
+                str(FFMPEG_PATH),
+                '-loglevel', 'error',  # Only report actual errors
+                '-nostats',  # No per-frame progress lines
+                '-i', str(input_path),
+                '-c:v', 'copy',  # Copy video stream
+                *audio_args,
+                '-movflags', '+faststart',  # Optimize for streaming
+                '-y',  # Overwrite
+                str(output_path)
+            ]
             
-            return str(output_path)
-        else:
-            print(f"❌ Conversion failed: {result.stderr[:200]}")
-            return str(input_path)  # Return original if conversion failed
+            # Run FFmpeg with stdout discarded - only stderr is ever read
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await asyncio.wait_for(proc.communicate(), timeout=300)  # 5 minute timeout
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
             
-    except subprocess.TimeoutExpired:
+            if proc.returncode != 0 or not output_path.exists():
+                print(f"❌ Conversion failed: {stderr[:200].decode('utf-8', errors='replace')}")
+                return str(input_path)  # Return original if conversion failed
+        
+        print(f"✅ Converted to MP4: {output_path.name}")
+        
+        # Delete original if requested and different from output
+        if delete_original and input_path != output_path and input_path.exists():
+            input_path.unlink()
+            print(f"🗑️ Deleted original: {input_path.name}")
+        
+        return str(output_path)
+            
+    except asyncio.TimeoutError:
         print(f"⏱️ Conversion timeout for {input_path.name}")
         return str(input_path)
     except Exception as e:
@@ -129,7 +309,7 @@ def parse_channel_url(url):
     url = url.strip()
     
     # Handle t.me/c/ format (private channels) with optional topic ID
-    c_match = re.search(r't\.me/c/(\d+)(?:/(\d+))?', url)
+    c_match = _RE_TME_C.search(url)
     if c_match:
         # Convert to full channel ID format
         channel_id = int(f"-100{c_match.group(1)}")
@@ -137,19 +317,19 @@ def parse_channel_url(url):
         return channel_id, topic_id
     
     # Handle web.telegram.org URLs
-    web_match = re.search(r'web\.telegram\.org/[^#]*#(-?\d+)', url)
+    web_match = _RE_WEB.search(url)
     if web_match:
         return int(web_match.group(1)), None
     
     # Handle regular t.me links with optional message/topic
-    tme_match = re.search(r't\.me/([^/?]+)(?:/(\d+))?', url)
+    tme_match = _RE_TME.search(url)
     if tme_match:
         channel = tme_match.group(1)
         topic_id = int(tme_match.group(2)) if tme_match.group(2) else None
         return channel, topic_id
     
     # Handle direct channel IDs
-    if re.match(r'^-?\d+$', url):
+    if _RE_ID.match(url):
         return int(url), None
     
     # Return as username
@@ -172,50 +352,38 @@ def get_file_info(message):
         info["type"] = "Photo"
         info["extension"] = ".jpg"
         info["name"] = f"photo_{message.id}.jpg"
-        if hasattr(message.photo, 'sizes') and message.photo.sizes:
-            info["size"] = max(size.size if hasattr(size, 'size') else 0 
-                             for size in message.photo.sizes)
+        # Telegram lists sizes smallest first, so the last one with a byte size is the largest
+        sizes = getattr(message.photo, 'sizes', None) or ()
+        info["size"] = next((size.size for size in reversed(sizes) if getattr(size, 'size', 0)), 0)
     elif message.document:
         info["type"] = "Document"
         info["size"] = message.document.size
         info["mime_type"] = message.document.mime_type or "unknown"
         
         # Get filename and extension from attributes
+        has_filename = False
         for attr in message.document.attributes:
             if isinstance(attr, DocumentAttributeFilename):
                 info["name"] = attr.file_name
                 # Extract extension
                 if '.' in attr.file_name:
                     info["extension"] = os.path.splitext(attr.file_name)[1]
+                has_filename = True
                 break
         
-        # If no filename found, generate one based on mime type
-        if info["name"] == f"file_{message.id}":
-            ext = ""
-            if "video" in info["mime_type"]:
-                ext = ".mp4"
-                info["type"] = "Video"
-            elif "audio" in info["mime_type"]:
-                ext = ".mp3"
-                info["type"] = "Audio"
-            elif "application/pdf" in info["mime_type"]:
-                ext = ".pdf"
-                info["type"] = "PDF"
-            elif "application/zip" in info["mime_type"]:
-                ext = ".zip"
-                info["type"] = "ZIP"
+        # Determine document type based on mime or extension
+        mime_type = info["mime_type"]
+        extension = info["extension"].lower()
+        for mime_fragment, extensions, doc_type in _DOCUMENT_TYPES:
+            if mime_fragment in mime_type or extension in extensions:
+                info["type"] = doc_type
+                break
+        
+        # If no filename found, generate one based on the detected type
+        if not has_filename:
+            ext = _TYPE_EXTENSIONS.get(info["type"], "")
             info["name"] = f"document_{message.id}{ext}"
             info["extension"] = ext
-        
-        # Determine document type based on mime or extension
-        if "video" in info["mime_type"] or info["extension"] in ['.mp4', '.mkv', '.avi', '.mov', '.webm']:
-            info["type"] = "Video"
-        elif "audio" in info["mime_type"] or info["extension"] in ['.mp3', '.m4a', '.wav', '.ogg']:
-            info["type"] = "Audio"
-        elif "application/pdf" in info["mime_type"] or info["extension"] == '.pdf':
-            info["type"] = "PDF"
-        elif "application/zip" in info["mime_type"] or info["extension"] == '.zip':
-            info["type"] = "ZIP"
     elif message.video:
         info["type"] = "Video"
         info["extension"] = ".mp4"
@@ -225,82 +393,113 @@ def get_file_info(message):
     return info
 
 
+def is_download_paused():
+    """Check whether downloads are currently paused."""
+    return st.session_state.get('download_paused', False)
+
+
+async def wait_if_paused(status_placeholder=None):
+    """Async pause helper so downloads can be resumed manually."""
+    while is_download_paused():
+        if status_placeholder:
+            status_placeholder.markdown("⏸️ Downloads paused. Click Resume to continue.")
+        await asyncio.sleep(0.3)
+
+
+def _unit_index(value):
+    """Pick the 1024-based unit for a value: 0 for bytes up to 4 for terabytes."""
+    if value < 1024:
+        return 0
+    # bit_length - 1 is floor(log2), computed on the integer without any float math
+    return min((int(value).bit_length() - 1) // 10, len(_UNIT_DIVISORS) - 1)
+
+
 def format_size(size):
     """Format bytes to human-readable size."""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size < 1024.0:
-            return f"{size:.2f} {unit}"
-        size /= 1024.0
-    return f"{size:.2f} TB"
+    idx = _unit_index(size)
+    return f"{size / _UNIT_DIVISORS[idx]:.2f} {_SIZE_UNITS[idx]}"
 
 
 async def get_client():
-    """Get or create a shared Telegram client to avoid database locks."""
-    global _client_instance
+    """Get or create a shared Telegram client to avoid database locks.
+    
+    Concurrent callers share one connection attempt: the first caller starts it
+    as a task and everyone else awaits that same task.
+    """
+    runtime = _async_runtime()
     
     # Use existing client if available and connected
-    if _client_instance and _client_instance.is_connected():
-        return _client_instance
+    if runtime.client and runtime.client.is_connected():
+        return runtime.client
+    
+    # Start a new attempt unless one is still in flight on this loop; a finished
+    # attempt (including a cancelled or failed one) is never reused
+    if (runtime.client_task is None or runtime.client_task.done()
+            or runtime.client_task.get_loop() is not asyncio.get_running_loop()):
+        runtime.client_task = asyncio.create_task(_connect_new_client())
+    
+    # Shielded so a caller whose rerun is cancelled doesn't cancel the attempt for everyone else
+    return await asyncio.shield(runtime.client_task)
+
+
+async def _connect_new_client():
+    """Connect a fresh client and publish it as the shared instance."""
+    runtime = _async_runtime()
     
-    async with _client_lock:
-        # Double-check after acquiring lock
-        if _client_instance and _client_instance.is_connected():
-            return _client_instance
+    try:
+        # Close any existing disconnected client
+        if runtime.client:
+            try:
+                await runtime.client.disconnect()
+            except:
+                pass
         
-        try:
-            # Close any existing disconnected client
-            if _client_instance:
+        # Check if we have a saved session string in .env or Streamlit secrets
+        session_string = os.getenv("SESSION_STRING") or st.secrets.get("SESSION_STRING", "")
+        session_to_use = StringSession(session_string) if session_string else session_name
+        
+        # Try to load session string from SQLite session (local only)
+        session_file = f"{session_name}.session"
+        
+        # If SQLite session exists locally, use it
+        if os.path.exists(session_file) and not session_string:
+            try:
+                # Try to read the session with a short timeout
+                temp_client = TelegramClient(session_name, api_id, api_hash)
+                await asyncio.wait_for(temp_client.connect(), timeout=3)
+                
+                if await temp_client.is_user_authorized():
+                    # Export to string session to avoid locks
+                    string_session = StringSession.save(temp_client.session)
+                    await temp_client.disconnect()
+                    session_to_use = StringSession(string_session)
+                    st.info("✅ Using in-memory session to avoid database locks")
+                else:
+                    await temp_client.disconnect()
+                    st.error("Please authorize the client first by running: python authenticate.py")
+                    return None
+                    
+            except (asyncio.TimeoutError, Exception) as e:
+                # Session is locked, try to use it anyway with retry
+                st.warning("⚠️ Session file locked, retrying...")
+                await asyncio.sleep(1)
+                
+                # Retry with the file session
                 try:
-                    await _client_instance.disconnect()
+                    session_to_use = session_name
                 except:
-                    pass
+                    st.error(f"Cannot access session file: {e}")
+                    st.info("💡 Tip: Close any other programs using Telegram (including authenticate.py)")
+                    return None
+        elif not session_string:
+            # No session file and no session string - need authentication
+            st.error("❌ No session found. Please authenticate first.")
+            st.info("**For cloud deployment:** Add your `SESSION_STRING` to Streamlit secrets")
+            st.info("**For local use:** Run `python authenticate.py` to create session.session file")
             
-            # Check if we have a saved session string in Streamlit secrets
-            session_string = st.secrets.get("SESSION_STRING", "")
-            session_to_use = StringSession(session_string) if session_string else session_name
-            
-            # Try to load session string from SQLite session (local only)
-            session_file = f"{session_name}.session"
-            
-            # If SQLite session exists locally, use it
-            if os.path.exists(session_file) and not session_string:
-                try:
-                    # Try to read the session with a short timeout
-                    temp_client = TelegramClient(session_name, api_id, api_hash)
-                    await asyncio.wait_for(temp_client.connect(), timeout=3)
-                    
-                    if await temp_client.is_user_authorized():
-                        # Export to string session to avoid locks
-                        string_session = StringSession.save(temp_client.session)
-                        await temp_client.disconnect()
-                        session_to_use = StringSession(string_session)
-                        st.info("✅ Using in-memory session to avoid database locks")
-                    else:
-                        await temp_client.disconnect()
-                        st.error("Please authorize the client first by running: python authenticate.py")
-                        return None
-                        
-                except (asyncio.TimeoutError, Exception) as e:
-                    # Session is locked, try to use it anyway with retry
-                    st.warning("⚠️ Session file locked, retrying...")
-                    await asyncio.sleep(1)
-                    
-                    # Retry with the file session
-                    try:
-                        session_to_use = session_name
-                    except:
-                        st.error(f"Cannot access session file: {e}")
-                        st.info("💡 Tip: Close any other programs using Telegram (including authenticate.py)")
-                        return None
-            elif not session_string:
-                # No session file and no session string - need authentication
-                st.error("❌ No session found. Please authenticate first.")
-                st.info("**For cloud deployment:** Add your `SESSION_STRING` to Streamlit secrets")
-                st.info("**For local use:** Run `python authenticate.py` to create session.session file")
-                
-                # Show how to get session string
-                with st.expander("🔑 How to get SESSION_STRING"):
-                    st.code("""
+            # Show how to get session string
+            with st.expander("🔑 How to get SESSION_STRING"):
+                st.code("""
 # Run this script locally to get your SESSION_STRING:
 
 from telethon.sync import TelegramClient
@@ -313,33 +512,33 @@ with TelegramClient(StringSession(), api_id, api_hash) as client:
     print("Your SESSION_STRING:")
     print(client.session.save())
 """, language="python")
-                return None
-            
-            # Create new client with the selected session
-            client = TelegramClient(
-                session_to_use, 
-                api_id, 
-                api_hash,
-                connection_retries=5,
-                retry_delay=1,
-                auto_reconnect=True,
-                sequential_updates=True,
-                timeout=30
-            )
-            
-            await client.connect()
-            
-            if not await client.is_user_authorized():
-                st.error("Please authorize the client first by running: python authenticate.py")
-                return None
-            
-            _client_instance = client
-            return client
-            
-        except Exception as e:
-            st.error(f"Error connecting to Telegram: {e}")
-            st.info("💡 Try: \n1. Close other Telegram apps\n2. Re-run: python authenticate.py\n3. Restart Streamlit")
             return None
+        
+        # Create new client with the selected session
+        client = TelegramClient(
+            session_to_use, 
+            api_id, 
+            api_hash,
+            connection_retries=5,
+            retry_delay=1,
+            auto_reconnect=True,
+            sequential_updates=True,
+            timeout=30
+        )
+        
+        await client.connect()
+        
+        if not await client.is_user_authorized():
+            st.error("Please authorize the client first by running: python authenticate.py")
+            return None
+        
+        runtime.client = client
+        return client
+        
+    except Exception as e:
+        st.error(f"Error connecting to Telegram: {e}")
+        st.info("💡 Try: \n1. Close other Telegram apps\n2. Re-run: python authenticate.py\n3. Restart Streamlit")
+        return None
 
 
 async def get_channel_info(channel_identifier):
@@ -382,13 +581,42 @@ async def get_channel_info(channel_identifier):
         return None, None
 
 
+def _open_fetch_cache():
+    """Open the local fetch cache, creating its tables on first use."""
+    cache = sqlite3.connect(FETCH_CACHE_PATH)
+    cache.executescript("""
+        CREATE TABLE IF NOT EXISTS media (
+            channel_id INTEGER NOT NULL,
+            topic_key INTEGER NOT NULL,
+            fetch_limit INTEGER NOT NULL,
+            msg_id INTEGER NOT NULL,
+            topic_id INTEGER,
+            file_info TEXT NOT NULL,
+            PRIMARY KEY (channel_id, topic_key, fetch_limit, msg_id)
+        );
+        CREATE TABLE IF NOT EXISTS topic_names (
+            channel_id INTEGER NOT NULL,
+            topic_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (channel_id, topic_id)
+        );
+    """)
+    return cache
+
+
 async def fetch_media_list(channel_identifier, limit=10000, topic_id=None):
     """Fetch all media from a channel or specific topic with proper folder structure.
     
+    Results are kept in a local SQLite cache, so fetching the same channel
+    again only asks Telegram for messages newer than the newest cached one.
+    
     Args:
         channel_identifier: Channel username or ID
         limit: Maximum messages to fetch
         topic_id: Specific topic/thread ID to fetch from (optional)
+    
+    Returns:
+        Tuple of (channel info dict, media list, topics structure, topic names, topic_id)
     """
     client = await get_client()
     if not client:
@@ -396,66 +624,257 @@ async def fetch_media_list(channel_identifier, limit=10000, topic_id=None):
     
     try:
         channel = await client.get_entity(channel_identifier)
+        cache_key = (channel.id, topic_id or 0, limit)
         
-        # Check if it's a forum/topic-based channel
-        is_forum = hasattr(channel, 'forum') and channel.forum
+        with closing(_open_fetch_cache()) as cache:
+            cached_rows = cache.execute(
+                "SELECT msg_id, topic_id, file_info FROM media"
+                " WHERE channel_id = ? AND topic_key = ? AND fetch_limit = ? ORDER BY msg_id DESC",
+                cache_key
+            ).fetchall()
+            topic_names = dict(cache.execute(
+                "SELECT topic_id, name FROM topic_names WHERE channel_id = ?", (channel.id,)
+            ))
+        
+        # Only ask for messages newer than the newest one already cached
+        min_id = cached_rows[0][0] if cached_rows else 0
         
         # Fetch messages - either from specific topic or all
         if topic_id:
             # Fetch messages from specific topic only
-            messages = await client.get_messages(channel, limit=limit, reply_to=topic_id)
+            messages = await client.get_messages(channel, limit=limit, reply_to=topic_id, min_id=min_id)
         else:
             # Fetch all messages
-            messages = await client.get_messages(channel, limit=limit)
-        
-        # Filter only messages with media
-        media_messages = [msg for msg in messages if msg.media]
+            messages = await client.get_messages(channel, limit=limit, min_id=min_id)
         
-        # Organize messages by topic/thread with proper names
-        topics_structure = {}
-        topic_names = {}  # Map topic_id to topic name
+        # Oldest message id a fresh fetch of `limit` messages would reach
+        oldest_id = 0
+        if len(messages) >= limit:
+            # New messages alone fill the limit, so there may be a gap before the cached ones
+            cached_rows = []
+            oldest_id = messages[-1].id
+        elif cached_rows:
+            # The limit counts every message, not just media - ask where that window ends now
+            history_kwargs = {'reply_to': topic_id} if topic_id else {}
+            boundary = await client.get_messages(channel, limit=1, add_offset=limit - 1, **history_kwargs)
+            oldest_id = boundary[0].id if boundary else 0
         
-        # First pass: identify topics and their names
+        # Single pass: keep media messages, note their topic and which topics need names
+        new_rows = []  # (message id, topic id, file info)
+        missing_topic_ids = set()
         for msg in messages:
-            if msg.reply_to and hasattr(msg.reply_to, 'reply_to_top_id'):
-                topic_id = msg.reply_to.reply_to_top_id
-                if topic_id not in topic_names:
-                    # Try to get the topic message to extract the name
-                    try:
-                        topic_msg = await client.get_messages(channel, ids=topic_id)
-                        if topic_msg and topic_msg.message:
-                            # Use first line of message as topic name, or full message if short
-                            topic_title = topic_msg.message.split('\n')[0][:50]
-                            topic_names[topic_id] = topic_title
-                        else:
-                            topic_names[topic_id] = f"Topic_{topic_id}"
-                    except:
-                        topic_names[topic_id] = f"Topic_{topic_id}"
-        
-        # Second pass: organize media by topic
-        for msg in media_messages:
-            if msg.reply_to and hasattr(msg.reply_to, 'reply_to_top_id'):
-                topic_id = msg.reply_to.reply_to_top_id
-                topic_name = topic_names.get(topic_id, f"Topic_{topic_id}")
-            else:
-                topic_name = "General"
+            if not msg.media:
+                continue
+            reply_to = msg.reply_to
+            tid = getattr(reply_to, 'reply_to_top_id', None) if reply_to else None
+            new_rows.append((msg.id, tid, get_file_info(msg)))
+            if tid and tid not in topic_names:
+                missing_topic_ids.add(tid)
+        
+        # Topics that could not be named last time are only cached under a fallback, so retry them
+        for _, tid, _ in cached_rows:
+            if tid and tid not in topic_names:
+                missing_topic_ids.add(tid)
+        
+        # Fetch names of topics not seen before in one request
+        resolved_names = {}
+        if missing_topic_ids:
+            missing_topic_ids = list(missing_topic_ids)
+            try:
+                topic_msgs = await client.get_messages(channel, ids=missing_topic_ids)
+            except Exception:
+                topic_msgs = [None] * len(missing_topic_ids)
             
-            if topic_name not in topics_structure:
-                topics_structure[topic_name] = []
-            topics_structure[topic_name].append(msg)
+            for tid, topic_msg in zip(missing_topic_ids, topic_msgs):
+                if topic_msg and topic_msg.message:
+                    # Use first line of message as topic name, or full message if short
+                    resolved_names[tid] = topic_msg.message.split('\n')[0][:50]
+                else:
+                    topic_names[tid] = f"Topic_{tid}"
+            topic_names.update(resolved_names)
+        
+        # Newest first, as Telegram returns them, and only within the last `limit` messages
+        rows = new_rows + [
+            (msg_id, tid, json.loads(info)) for msg_id, tid, info in cached_rows if msg_id >= oldest_id
+        ]
         
-        # Sort messages in each topic by date (oldest first to maintain order)
-        for topic_name in topics_structure:
-            topics_structure[topic_name].sort(key=lambda m: m.date)
+        # Remember what was fetched (the connection context manager commits)
+        with closing(_open_fetch_cache()) as cache, cache:
+            if not cached_rows:
+                cache.execute(
+                    "DELETE FROM media WHERE channel_id = ? AND topic_key = ? AND fetch_limit = ?", cache_key
+                )
+            cache.executemany(
+                "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?)",
+                [(*cache_key, msg_id, tid, json.dumps(info)) for msg_id, tid, info in new_rows]
+            )
+            if oldest_id:
+                # Drop cached rows pushed out of the window by the new ones
+                cache.execute(
+                    "DELETE FROM media WHERE channel_id = ? AND topic_key = ? AND fetch_limit = ? AND msg_id < ?",
+                    (*cache_key, oldest_id)
+                )
+            cache.executemany(
+                "INSERT OR REPLACE INTO topic_names VALUES (?, ?, ?)",
+                [(channel.id, tid, name) for tid, name in resolved_names.items()]
+            )
+        
+        # Organize media by topic
+        topics_structure = defaultdict(list)
+        for _, tid, info in rows:
+            topics_structure[topic_names.get(tid, f"Topic_{tid}") if tid else "General"].append(info)
+        
+        # Sort files in each topic by date (oldest first to maintain order)
+        for topic_infos in topics_structure.values():
+            topic_infos.sort(key=lambda info: info["date"])
+        
+        channel_info = {
+            "title": channel.title,
+            "id": channel.id,
+        }
         
         # Don't disconnect - using shared client
-        return channel, media_messages, topics_structure, topic_names, topic_id
+        return channel_info, [info for _, _, info in rows], dict(topics_structure), topic_names, topic_id
     except Exception as e:
         st.error(f"Error: {e}")
         return None, [], {}, {}, topic_id
 
 
-async def download_single_file(client, channel, message, folder, file_number, file_info, progress_dict, file_id):
+class MediaFetchError(Exception):
+    """Raised when a channel fetch fails, so the failure is never cached."""
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_media_list(channel_identifier, limit=10000, topic_id=None):
+    """Fetch a channel's media as plain data, cached for five minutes.
+    
+    Reruns with the same channel, limit and topic return the cached result
+    instead of going back to Telegram. Only picklable data is returned - the
+    download paths re-fetch live messages by ID.
+    
+    Returns:
+        Tuple of (channel info dict, media list, topics structure, topic names)
+    """
+    channel_info, media_list, topics_structure, topic_names, _ = run_async(
+        fetch_media_list(channel_identifier, limit, topic_id)
+    )
+    if not channel_info:
+        raise MediaFetchError(f"Could not fetch media from {channel_identifier}")
+    
+    return channel_info, media_list, topics_structure, topic_names
+
+
+
+def build_type_index(media_list, topics_structure):
+    """Group file infos by topic and type, with the total size of each group.
+    
+    Topic "All" covers the whole media list and type "All" covers every type,
+    so any topic/type filter in the UI is a pair of dict lookups.
+    
+    Returns:
+        Tuple of (index, sizes) where index[topic][type] is the list of file
+        infos and sizes[topic][type] their combined size in bytes
+    """
+    index = {}
+    sizes = {}
+    for topic_name, infos in [("All", media_list), *topics_structure.items()]:
+        by_type = defaultdict(list)
+        for info in infos:
+            by_type[info["type"]].append(info)
+        by_type["All"] = infos
+        
+        index[topic_name] = dict(by_type)
+        sizes[topic_name] = {file_type: sum(info["size"] for info in group) for file_type, group in by_type.items()}
+    return index, sizes
+
+
+def build_media_frame(media):
+    """Build the media table rows (with an unticked Select column) for a list of file infos."""
+    return pd.DataFrame({
+        "Select": [False] * len(media),
+        "File Name": [info["name"] for info in media],
+        "Type": [info["type"] for info in media],
+        "Size": [format_size(info["size"]) for info in media],
+        "Date": [info["date"] for info in media],
+    })
+
+async def _fetch_messages(client, channel, message_ids):
+    """Fetch messages by ID in one batched request, always returning a list."""
+    messages = await client.get_messages(channel, ids=message_ids)
+    if not isinstance(messages, list):
+        messages = [messages]
+    return messages
+
+
+def _preallocate(f, size):
+    """Size an open file to its final length before any chunk is written.
+    
+    Large files get their blocks reserved in one posix_fallocate call so the
+    filesystem lays them out contiguously; elsewhere (Windows, or filesystems
+    without fallocate) the file is just extended to its final size.
+    """
+    if size >= PREALLOCATE_MIN_SIZE:
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except (AttributeError, OSError):
+            pass
+    f.truncate(size)
+
+
+async def _parallel_download(client, message, file_path, file_size, progress_callback, part_limiter,
+                             parts=PARALLEL_DOWNLOAD_PARTS):
+    """Download a document over several interleaved iter_download streams.
+    
+    Stream i fetches chunks i, i + parts, i + 2*parts, ... and writes each one at
+    its own offset, so the streams never overlap and Telegram serves them
+    concurrently instead of one request at a time.
+    
+    Returns:
+        Number of bytes received (the file itself is preallocated to full size)
+    """
+    stride = parts * DOWNLOAD_CHUNK_SIZE
+    downloaded = 0
+    
+    with open(file_path, 'wb') as f:
+        # Size the file up front so every stream can write at its offset
+        _preallocate(f, file_size)
+        
+        async def fetch_part(part):
+            nonlocal downloaded
+            offset = part * DOWNLOAD_CHUNK_SIZE
+            async with part_limiter:
+                async for chunk in client.iter_download(
+                    message.document,
+                    offset=offset,
+                    stride=stride,
+                    chunk_size=DOWNLOAD_CHUNK_SIZE,
+                    request_size=DOWNLOAD_CHUNK_SIZE,
+                    file_size=file_size
+                ):
+                    # No await between seek and write, so streams can't interleave here
+                    f.seek(offset)
+                    f.write(chunk)
+                    offset += stride
+                    downloaded += len(chunk)
+                    progress_callback(downloaded, file_size)
+        
+        tasks = [asyncio.create_task(fetch_part(part)) for part in range(parts)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One stream failed (or the download was cancelled) - stop the others
+            # and let them finish unwinding before the file is closed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    return downloaded
+
+
+async def download_single_file(client, channel, message, folder, file_number, file_info, progress_dict, file_id,
+                               part_limiter=None):
     """Download a single file with progress tracking."""
     try:
         # Preserve original filename with proper extension
@@ -469,9 +888,14 @@ async def download_single_file(client, channel, message, folder, file_number, fi
         custom_name = f"{file_number}_{original_name}"
         
         # Sanitize filename to remove invalid characters
-        custom_name = custom_name.replace('/', '_').replace('\\', '_').replace(':', '_').replace('*', '_').replace('?', '_').replace('"', '_').replace('<', '_').replace('>', '_').replace('|', '_')
+        custom_name = custom_name.translate(_FILENAME_SANITIZE)
         
         file_path = os.path.join(folder, custom_name)
+        
+        # Fall back to the extension Telegram reports for the media type
+        if not os.path.splitext(file_path)[1] and message.file and message.file.ext:
+            file_path += message.file.ext
+        
         start_time = time.time()
         
         progress_dict[file_id] = {
@@ -479,7 +903,8 @@ async def download_single_file(client, channel, message, folder, file_number, fi
             'total': file_info['size'],
             'speed': 0,
             'name': original_name,
-            'status': 'downloading'
+            'status': 'downloading',
+            '_total_str': format_size(file_info['size'])  # The total never changes, so format it once
         }
         
         def progress_callback(current, total):
@@ -491,50 +916,54 @@ async def download_single_file(client, channel, message, folder, file_number, fi
         # Ensure folder exists
         os.makedirs(folder, exist_ok=True)
         
-        # Download file - let Telegram handle the extension automatically
-        # If we don't specify extension, Telethon will preserve the original
-        downloaded_path = await message.download_media(
-            file=folder,  # Just specify folder, let Telethon name it
-            progress_callback=progress_callback
-        )
+        received = None
+        if message.document and file_info['size'] >= PARALLEL_DOWNLOAD_MIN_SIZE:
+            # Large document - fetch several chunks at once
+            received = await _parallel_download(
+                client, message, file_path, file_info['size'], progress_callback,
+                part_limiter or asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+            )
+            downloaded_path = file_path
+        elif message.document:
+            # Small document - one stream, but in the largest parts Telegram serves
+            await client.download_file(
+                message.document,
+                file_path,
+                part_size_kb=DOWNLOAD_CHUNK_SIZE // 1024,
+                file_size=file_info['size'],
+                progress_callback=progress_callback
+            )
+            downloaded_path = file_path
+        else:
+            # Download straight to the final numbered name - no rename afterwards
+            downloaded_path = await message.download_media(
+                file=file_path,
+                progress_callback=progress_callback
+            )
         
-        # Rename to our custom name with number prefix
         if downloaded_path and os.path.exists(downloaded_path):
-            # Get the extension from the downloaded file
-            actual_ext = os.path.splitext(downloaded_path)[1]
-            
-            # If our custom name doesn't have this extension, add it
-            if not custom_name.endswith(actual_ext) and actual_ext:
-                custom_name = os.path.splitext(custom_name)[0] + actual_ext
-                file_path = os.path.join(folder, custom_name)
-            
-            # Rename to numbered version
-            if downloaded_path != file_path:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    os.rename(downloaded_path, file_path)
-                    downloaded_path = file_path
-                except Exception as rename_error:
-                    # If rename fails, keep original name
-                    st.warning(f"Could not rename {os.path.basename(downloaded_path)}: {rename_error}")
-            
             elapsed = time.time() - start_time
             progress_dict[file_id]['status'] = 'completed'
             progress_dict[file_id]['time'] = elapsed
             progress_dict[file_id]['path'] = downloaded_path
             
-            # Verify file size matches
-            actual_size = os.path.getsize(downloaded_path)
-            if actual_size < file_info['size'] * 0.95:  # Allow 5% tolerance
+            # Verify file size matches - a preallocated file is always full size,
+            # so parallel downloads are checked by the bytes that actually arrived
+            if received is not None:
+                actual_size = received
+                incomplete = received != file_info['size']
+            else:
+                actual_size = os.path.getsize(downloaded_path)
+                incomplete = actual_size < file_info['size'] * 0.95  # Allow 5% tolerance
+            if incomplete:
                 progress_dict[file_id]['status'] = 'error'
                 progress_dict[file_id]['error'] = f'Incomplete download: {format_size(actual_size)} / {format_size(file_info["size"])}'
                 return None
             
             # Convert video if enabled and it's a video file
-            if st.session_state.get('convert_videos', True) and file_info['type'] == 'video':
+            if st.session_state.get('convert_videos', True) and file_info['type'] == 'Video':
                 progress_dict[file_id]['status'] = 'converting'
-                converted_path = convert_video_to_mp4(downloaded_path)
+                converted_path = await convert_video_to_mp4_async(downloaded_path)
                 if converted_path:
                     downloaded_path = converted_path
                     progress_dict[file_id]['path'] = converted_path
@@ -561,12 +990,12 @@ async def download_files(channel_identifier, message_ids, progress_container, to
         channel = await client.get_entity(channel_identifier)
         
         # Create base downloads folder
-        base_folder = f"downloads/{channel.title.replace(' ', '_').replace('/', '_')}"
+        base_folder = f"downloads/{channel.title.translate(_TITLE_SANITIZE)}"
         
         # If topic specified, create subfolder
         if topic_name and topic_name != "General":
             # Sanitize folder name
-            safe_topic_name = topic_name.replace('/', '_').replace('\\', '_').replace(':', '_')
+            safe_topic_name = topic_name.translate(_FILENAME_SANITIZE)
             folder = f"{base_folder}/{safe_topic_name}"
         else:
             folder = base_folder
@@ -585,9 +1014,7 @@ async def download_files(channel_identifier, message_ids, progress_container, to
             active_downloads = st.empty()
             
             # Get all messages first
-            messages = await client.get_messages(channel, ids=message_ids)
-            if not isinstance(messages, list):
-                messages = [messages]
+            messages = await _fetch_messages(client, channel, message_ids)
             
             # Filter out messages without media
             download_queue = []
@@ -599,55 +1026,70 @@ async def download_files(channel_identifier, message_ids, progress_container, to
             
             progress_dict = {}
             completed = 0
+            part_limiter = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+            
+            last_rendered = None
             
-            # Download in batches for concurrent processing
-            for i in range(0, len(download_queue), concurrent):
-                batch = download_queue[i:i+concurrent]
+            def refresh_active_downloads():
+                """Show in-flight files and their combined speed."""
+                nonlocal last_rendered
+                active_files = []
+                total_speed = 0
                 
-                # Respect manual pause between batches
-                await wait_if_paused(overall_status)
-
-                # Start concurrent downloads - create tasks properly
-                tasks = [
-                    asyncio.create_task(download_single_file(client, channel, msg, folder, file_num, file_info, progress_dict, file_id))
-                    for msg, file_num, file_info, file_id in batch
-                ]
+                for file_id, progress in progress_dict.items():
+                    if progress['status'] == 'downloading':
+                        # Re-format a line only once it has moved by 1% or 1 MiB
+                        step = max(1 << 20, progress['total'] // 100)
+                        if '_line' not in progress or progress['downloaded'] - progress['_last_shown'] >= step:
+                            progress['_last_shown'] = progress['downloaded']
+                            progress['_line'] = f"📄 {progress['name']}: {format_size(progress['downloaded'])} / {progress['_total_str']}"
+                        active_files.append(progress['_line'])
+                        total_speed += progress.get('speed', 0)
+                    elif progress['status'] == 'converting':
+                        active_files.append(f"🔄 Converting {progress['name']} to MP4...")
                 
-                # Monitor progress while downloading
-                done_tasks = set()
-                while len(done_tasks) < len(tasks):
+                if active_files:
+                    rendered = "\n\n".join(active_files[:concurrent + 2])  # Show a bit more for converting files
+                    if rendered != last_rendered:
+                        active_downloads.markdown(rendered)
+                        last_rendered = rendered
+                    if total_speed > 0:
+                        speed_display.markdown(f"**⚡ Total Speed:** {format_speed(total_speed)}")
+                    else:
+                        speed_display.markdown("**🔄 Converting videos...**")
+            
+            async def ui_tick():
+                """Refresh the active downloads once per second until cancelled."""
+                while True:
                     # Respect manual pause during active downloads
                     await wait_if_paused(overall_status)
-                    await asyncio.sleep(0.3)
-                    
-                    # Update UI
-                    active_files = []
-                    total_speed = 0
-                    
-                    for file_id, progress in progress_dict.items():
-                        if progress['status'] == 'downloading':
-                            active_files.append(f"📄 {progress['name']}: {format_size(progress['downloaded'])} / {format_size(progress['total'])}")
-                            total_speed += progress.get('speed', 0)
-                        elif progress['status'] == 'converting':
-                            active_files.append(f"🔄 Converting {progress['name']} to MP4...")
-                    
-                    if active_files:
-                        active_downloads.markdown("\n\n".join(active_files[:concurrent + 2]))  # Show a bit more for converting files
-                        if total_speed > 0:
-                            speed_display.markdown(f"**⚡ Total Speed:** {format_speed(total_speed)}")
-                        else:
-                            speed_display.markdown("**🔄 Converting videos...**")
-                    
-                    # Check completed tasks
-                    for idx, task in enumerate(tasks):
-                        if task.done() and idx not in done_tasks:
-                            done_tasks.add(idx)
-                            completed += 1
-                            overall_progress.progress(completed / len(download_queue))
-                            overall_status.markdown(f"**Completed:** {completed} / {len(download_queue)} files")
+                    await asyncio.sleep(1)
+                    refresh_active_downloads()
+            
+            # At most `concurrent` files in flight - the next one starts as soon as any finishes
+            file_limiter = asyncio.BoundedSemaphore(concurrent)
+            
+            async def download_limited(msg, file_num, file_info, file_id):
+                async with file_limiter:
+                    # Respect manual pause before starting each file
+                    await wait_if_paused(overall_status)
+                    return await download_single_file(client, channel, msg, folder, file_num, file_info, progress_dict, file_id, part_limiter)
+            
+            ui_task = asyncio.create_task(ui_tick())
+            tasks = []
+            try:
+                tasks = [asyncio.create_task(download_limited(*item)) for item in download_queue]
                 
-                # Wait for all tasks in batch to complete
-                await asyncio.gather(*tasks)
+                # Update overall progress as each download finishes
+                for task in asyncio.as_completed(tasks):
+                    await task
+                    completed += 1
+                    overall_progress.progress(completed / len(download_queue))
+                    overall_status.markdown(f"**Completed:** {completed} / {len(download_queue)} files")
+            finally:
+                ui_task.cancel()
+                for task in tasks:
+                    task.cancel()
             
             # Clear active downloads display
             active_downloads.empty()
@@ -691,11 +1133,8 @@ async def download_files(channel_identifier, message_ids, progress_container, to
 
 def format_speed(bytes_per_second):
     """Format speed in bytes/second to human-readable format."""
-    for unit in ['B/s', 'KB/s', 'MB/s', 'GB/s']:
-        if bytes_per_second < 1024.0:
-            return f"{bytes_per_second:.2f} {unit}"
-        bytes_per_second /= 1024.0
-    return f"{bytes_per_second:.2f} TB/s"
+    idx = _unit_index(bytes_per_second)
+    return f"{bytes_per_second / _UNIT_DIVISORS[idx]:.2f} {_SPEED_UNITS[idx]}"
 
 
 def format_time(seconds):
@@ -712,8 +1151,28 @@ def format_time(seconds):
         return f"{hours}h {minutes}m"
 
 
+def _zip_entry(name):
+    """Return what to pass to ZipFile.open for an archive member.
+    
+    Already-compressed formats get a ZipInfo marked ZIP_STORED; anything else
+    is returned as a plain name and picks up the archive's default (fast
+    deflate) compression.
+    """
+    if os.path.splitext(name)[1].lower() not in _STORED_EXTENSIONS:
+        return name
+    
+    zinfo = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    zinfo.compress_type = zipfile.ZIP_STORED
+    zinfo.external_attr = 0o600 << 16  # Same permissions ZipFile.open gives a plain name
+    return zinfo
+
+
 async def export_as_zip(channel_identifier, message_ids, zip_name, progress_container, topic_name=None):
-    """Download selected files and create a ZIP archive."""
+    """Download selected files straight into a ZIP archive.
+    
+    Each file is streamed from Telegram into its archive entry as it arrives,
+    so nothing is staged in a temporary directory first.
+    """
     client = await get_client()
     if not client:
         return None
@@ -721,9 +1180,6 @@ async def export_as_zip(channel_identifier, message_ids, zip_name, progress_cont
     try:
         channel = await client.get_entity(channel_identifier)
         
-        # Create temporary directory for downloads
-        temp_dir = tempfile.mkdtemp()
-        
         total = len(message_ids)
         
         with progress_container:
@@ -733,84 +1189,87 @@ async def export_as_zip(channel_identifier, message_ids, zip_name, progress_cont
             
             current_file_info = st.empty()
             file_progress = st.progress(0)
-            download_stats = st.empty()
-            
-            temp_files = []
-            
-            # Download all files to temp directory
-            for idx, msg_id in enumerate(message_ids):
-                message = await client.get_messages(channel, ids=msg_id)
-                
-                if message and message.media:
-                    file_info = get_file_info(message)
-                    
-                    current_file_info.markdown(f"**📄 Downloading {idx + 1}/{total}:** `{file_info['name']}`")
-                    
-                    start_time = time.time()
-                    last_update_time = start_time
-                    
-                    def progress_callback(current, total_size):
-                        block_if_paused()
-                        nonlocal last_update_time
-                        current_time = time.time()
-                        
-                        if current_time - last_update_time >= 0.5 or current == total_size:
-                            last_update_time = current_time
-                            file_percent = (current / total_size * 100) if total_size > 0 else 0
-                            file_progress.progress(current / total_size if total_size > 0 else 0)
-                            
-                            elapsed = current_time - start_time
-                            if elapsed > 0:
-                                speed = current / elapsed
-                                download_stats.markdown(f"""
-                                **Progress:** {format_size(current)} / {format_size(total_size)} ({file_percent:.1f}%)  
-                                **Speed:** {format_speed(speed)}
-                                """)
-                    
-                    # Download to temp directory
-                    file_number = str(idx + 1).zfill(3)
-                    custom_name = f"{file_number}_{file_info['name']}"
-                    await wait_if_paused(overall_status)
-                    file_path = await message.download_media(
-                        file=f"{temp_dir}/{custom_name}",
-                        progress_callback=progress_callback
-                    )
-                    
-                    if file_path:
-                        temp_files.append((file_path, custom_name))
-                    
-                    overall_progress.progress((idx + 1) / total)
-                    overall_status.markdown(f"**Downloaded:** {idx + 1} / {total} files")
-            
-            # Create ZIP file
-            current_file_info.markdown("**📦 Creating ZIP archive...**")
-            file_progress.progress(0)
             
             zip_path = f"downloads/{zip_name}"
             os.makedirs("downloads", exist_ok=True)
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for idx, (file_path, custom_name) in enumerate(temp_files):
-                    zipf.write(file_path, custom_name)
-                    file_progress.progress((idx + 1) / len(temp_files))
-                    download_stats.markdown(f"**Adding to ZIP:** {idx + 1} / {len(temp_files)} files")
-            
-            # Clean up temp files
-            for file_path, _ in temp_files:
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            
             try:
-                os.rmdir(temp_dir)
-            except:
-                pass
+                # Get all messages in one request before streaming any of them
+                messages = await _fetch_messages(client, channel, message_ids)
+                
+                loop = asyncio.get_running_loop()
+                
+                with open(zip_path, 'wb', buffering=ZIP_WRITE_BUFFER_SIZE) as zip_file, \
+                        zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+                    for idx, message in enumerate(messages):
+                        if message and message.media:
+                            file_info = get_file_info(message)
+                            
+                            current_file_info.markdown(f"**📄 Downloading {idx + 1}/{total}:** `{file_info['name']}`")
+                            
+                            start_time = time.monotonic()
+                            last_update_time = start_time
+                            
+                            def progress_callback(current, total_size):
+                                nonlocal last_update_time
+                                current_time = time.monotonic()
+                                
+                                # At most one UI update every 0.5s, plus the final one
+                                if current_time - last_update_time < 0.5 and current != total_size:
+                                    return
+                                last_update_time = current_time
+                                
+                                file_fraction = current / total_size if total_size > 0 else 0
+                                elapsed = current_time - start_time
+                                speed = current / elapsed if elapsed > 0 else 0
+                                
+                                # One widget write carries both the bar and the stats
+                                file_progress.progress(
+                                    min(file_fraction, 1.0),
+                                    text=f"**Progress:** {format_size(current)} / {format_size(total_size)} "
+                                         f"({file_fraction * 100:.1f}%) · **Speed:** {format_speed(speed)}"
+                                )
+                            
+                            # Stream the file into its archive entry
+                            file_number = str(idx + 1).zfill(3)
+                            custom_name = f"{file_number}_{file_info['name']}"
+                            await wait_if_paused(overall_status)
+                            if message.document:
+                                with zipf.open(_zip_entry(custom_name), 'w', force_zip64=True) as zip_entry:
+                                    downloaded = 0
+                                    async for chunk in client.iter_download(
+                                        message.document,
+                                        chunk_size=DOWNLOAD_CHUNK_SIZE,
+                                        request_size=DOWNLOAD_CHUNK_SIZE,
+                                        file_size=file_info['size']
+                                    ):
+                                        # Compress and write off the event loop so downloads keep flowing
+                                        await loop.run_in_executor(None, zip_entry.write, chunk)
+                                        downloaded += len(chunk)
+                                        progress_callback(downloaded, file_info['size'])
+                                        await wait_if_paused(overall_status)
+                            else:
+                                # Photos are small - let Telethon pick the largest size in memory
+                                photo = await message.download_media(
+                                    file=bytes,
+                                    progress_callback=progress_callback
+                                )
+                                # Web pages, polls and the like have nothing to download - leave them out
+                                if photo is not None:
+                                    with zipf.open(_zip_entry(custom_name), 'w', force_zip64=True) as zip_entry:
+                                        await loop.run_in_executor(None, zip_entry.write, photo)
+                            
+                            overall_progress.progress((idx + 1) / total)
+                            overall_status.markdown(f"**Downloaded:** {idx + 1} / {total} files")
+            except Exception:
+                # Don't leave a truncated archive behind
+                if os.path.exists(zip_path):
+                    os.remove(zip_path)
+                raise
             
             # Clear progress UI
             current_file_info.empty()
             file_progress.empty()
-            download_stats.empty()
             overall_progress.empty()
             overall_status.empty()
             
@@ -828,6 +1287,27 @@ async def export_as_zip(channel_identifier, message_ids, zip_name, progress_cont
         return None
 
 
+
+def render_zip_download(zip_path, zip_filename, **button_kwargs):
+    """Offer a finished archive for download in the browser.
+    
+    Streamlit keeps a download button's whole payload in server memory, so
+    archives above ZIP_BUTTON_MAX_SIZE are only pointed to on disk.
+    """
+    if os.path.getsize(zip_path) > ZIP_BUTTON_MAX_SIZE:
+        st.info(f"💾 Archive is too large to serve through the browser - find it at `{zip_path}`")
+        return
+    
+    with open(zip_path, "rb") as file:
+        st.download_button(
+            label="⬇️ Download ZIP File",
+            data=file,
+            file_name=zip_filename,
+            mime="application/zip",
+            type="primary",
+            **button_kwargs
+        )
+
 # Streamlit UI
 st.set_page_config(page_title="Telegram Media Downloader", page_icon="📥", layout="wide")
 
@@ -849,7 +1329,7 @@ with st.sidebar:
     st.subheader("⚡ Download Settings")
     concurrent_downloads = st.slider(
         "Concurrent downloads", 
-        1, 10, 3, 1,
+        1, 32, 3, 1,
         help="Download multiple files simultaneously for faster speed. Higher = faster but uses more bandwidth."
     )
     st.caption("💡 Tip: 3-5 concurrent downloads work best for most connections")
@@ -882,34 +1362,42 @@ if 'selected_topic' not in st.session_state:
     st.session_state.selected_topic = "All"
 if 'topic_names' not in st.session_state:
     st.session_state.topic_names = {}
+if 'type_index' not in st.session_state:
+    st.session_state.type_index = {}
+    st.session_state.type_sizes = {}
+if 'media_frames' not in st.session_state:
+    st.session_state.media_frames = {}
 if 'download_paused' not in st.session_state:
     st.session_state.download_paused = False
 
+# Parse the channel URL once per rerun - every handler below shares the result
+channel_id, url_topic_id = parse_channel_url(channel_url) if channel_url else (None, None)
+
 # Fetch media
 if fetch_button and channel_url:
     with st.spinner("Fetching media from channel..."):
-        channel_id, url_topic_id = parse_channel_url(channel_url)
-        
         if url_topic_id:
             st.info(f"📌 Fetching from specific topic/thread ID: {url_topic_id}")
         
-        channel, messages, topics_structure, topic_names, fetched_topic_id = asyncio.run(
-            fetch_media_list(channel_id, fetch_limit, url_topic_id)
-        )
+        try:
+            channel_info, media_list, topics_structure, topic_names = load_media_list(
+                channel_id, fetch_limit, url_topic_id
+            )
+        except MediaFetchError:
+            # The reason has already been shown by fetch_media_list
+            channel_info = None
         
-        if channel:
-            st.session_state.channel_info = {
-                "title": channel.title,
-                "id": channel.id,
-            }
-            st.session_state.media_list = [get_file_info(msg) for msg in messages]
-            st.session_state.messages_map = {msg.id: msg for msg in messages}
+        if channel_info:
+            st.session_state.channel_info = channel_info
+            st.session_state.media_list = media_list
             st.session_state.topics_structure = topics_structure
             st.session_state.topic_names = topic_names
             st.session_state.url_topic_id = url_topic_id
             
             # Create topics info for UI
             st.session_state.topics_list = list(topics_structure.keys())
+            st.session_state.type_index, st.session_state.type_sizes = build_type_index(media_list, topics_structure)
+            st.session_state.media_frames = {}
             
             if url_topic_id:
                 st.success(f"Found {len(st.session_state.media_list)} media files from topic ID {url_topic_id}!")
@@ -933,8 +1421,7 @@ if st.session_state.media_list:
         col_topics = st.columns(min(4, len(st.session_state.topics_structure)))
         for idx, (topic_name, topic_msgs) in enumerate(st.session_state.topics_structure.items()):
             with col_topics[idx % 4]:
-                media_count = len([get_file_info(msg) for msg in topic_msgs])
-                st.metric(topic_name, f"{media_count} files")
+                st.metric(topic_name, f"{len(topic_msgs)} files")
         
         st.markdown("---")
         
@@ -948,12 +1435,12 @@ if st.session_state.media_list:
     
     # Filter by selected topic
     if st.session_state.selected_topic != "All" and st.session_state.selected_topic in st.session_state.topics_structure:
-        filtered_by_topic = [get_file_info(msg) for msg in st.session_state.topics_structure[st.session_state.selected_topic]]
-        st.info(f"📂 Viewing: **{st.session_state.selected_topic}** ({len(filtered_by_topic)} files)")
+        topic_key = st.session_state.selected_topic
+        st.info(f"📂 Viewing: **{topic_key}** ({len(st.session_state.topics_structure[topic_key])} files)")
     else:
-        filtered_by_topic = st.session_state.media_list
+        topic_key = "All"
         if len(st.session_state.topics_structure) > 1:
-            st.info(f"📂 Viewing: **All Topics** ({len(filtered_by_topic)} files)")
+            st.info(f"📂 Viewing: **All Topics** ({len(st.session_state.media_list)} files)")
     
     # Filter options
     col1, col2 = st.columns([1, 3])
@@ -964,9 +1451,7 @@ if st.session_state.media_list:
         )
     
     # Filter media by type
-    filtered_media = filtered_by_topic
-    if filter_type != "All":
-        filtered_media = [m for m in filtered_by_topic if m["type"] == filter_type]
+    filtered_media = st.session_state.type_index[topic_key].get(filter_type, [])
     
     st.write(f"Showing {len(filtered_media)} files")
     
@@ -991,42 +1476,32 @@ if st.session_state.media_list:
     with col2:
         if st.button("📦 Export All as ZIP", type="secondary", use_container_width=True):
             progress_container = st.container()
-            channel_id, _ = parse_channel_url(channel_url)
             
             # Create ZIP filename
-            channel_name = st.session_state.channel_info['title'].replace(' ', '_').replace('/', '_')
+            channel_name = st.session_state.channel_info['title'].translate(_TITLE_SANITIZE)
             filter_suffix = f"_{filter_type}" if filter_type != "All" else ""
-            topic_suffix = f"_{st.session_state.selected_topic.replace(' ', '_')}" if st.session_state.selected_topic != "All" else "_All"
+            topic_suffix = f"_{st.session_state.selected_topic.translate(_TITLE_SANITIZE)}" if st.session_state.selected_topic != "All" else "_All"
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             zip_filename = f"{channel_name}{topic_suffix}{filter_suffix}_{timestamp}.zip"
             
             message_ids = [m["id"] for m in filtered_media]
             topic_for_export = st.session_state.selected_topic if st.session_state.selected_topic != "All" else None
             
-            zip_path = asyncio.run(export_as_zip(channel_id, message_ids, zip_filename, progress_container, topic_for_export))
+            zip_path = run_async(export_as_zip(channel_id, message_ids, zip_filename, progress_container, topic_for_export))
             
             if zip_path and os.path.exists(zip_path):
-                with open(zip_path, "rb") as file:
-                    st.download_button(
-                        label="⬇️ Download ZIP File",
-                        data=file,
-                        file_name=zip_filename,
-                        mime="application/zip",
-                        type="primary"
-                    )
+                render_zip_download(zip_path, zip_filename)
     
     with col3:
-        st.write(f"Total size: {format_size(sum(m['size'] for m in filtered_media))}")
+        st.write(f"Total size: {format_size(st.session_state.type_sizes[topic_key].get(filter_type, 0))}")
     
     if download_all:
         progress_container = st.container()
         
-        channel_id, _ = parse_channel_url(channel_url)
-        
         if st.session_state.selected_topic != "All":
             # Download from single topic
             message_ids = [m["id"] for m in filtered_media]
-            asyncio.run(download_files(channel_id, message_ids, progress_container, st.session_state.selected_topic, concurrent_downloads))
+            run_async(download_files(channel_id, message_ids, progress_container, st.session_state.selected_topic, concurrent_downloads))
         else:
             # Download all topics with organized folders
             with progress_container:
@@ -1034,24 +1509,26 @@ if st.session_state.media_list:
                 overall_progress = st.progress(0)
                 overall_status = st.empty()
                 
-                total_files = len(filtered_media)
+                total_files = len({m["id"] for m in filtered_media})
                 current = 0
+                seen_ids = set()
                 
-                for topic_name, topic_msgs in st.session_state.topics_structure.items():
-                    topic_media = [get_file_info(msg) for msg in topic_msgs]
-                    if filter_type != "All":
-                        topic_media = [m for m in topic_media if m["type"] == filter_type]
+                for topic_name in st.session_state.topics_structure:
+                    topic_media = st.session_state.type_index[topic_name].get(filter_type, [])
                     
-                    if topic_media:
+                    # Never download a message twice, even if it is listed under several topics
+                    message_ids = [m["id"] for m in topic_media if m["id"] not in seen_ids]
+                    seen_ids.update(message_ids)
+                    
+                    if message_ids:
                         overall_status.markdown(f"📂 **Downloading from:** {topic_name}")
-                        message_ids = [m["id"] for m in topic_media]
                         
                         # Download this topic
                         topic_container = st.container()
-                        asyncio.run(download_files(channel_id, message_ids, topic_container, topic_name, concurrent_downloads))
+                        run_async(download_files(channel_id, message_ids, topic_container, topic_name, concurrent_downloads))
                         
-                        current += len(topic_media)
-                        overall_progress.progress(current / total_files)
+                        current += len(message_ids)
+                        overall_progress.progress(min(current / total_files, 1.0))
                 
                 overall_status.markdown(f"✅ **All downloads complete!** {total_files} files downloaded.")
                 st.balloons()
@@ -1090,83 +1567,53 @@ if st.session_state.media_list:
     end_idx = min(start_idx + items_per_page, len(filtered_media))
     page_media = filtered_media[start_idx:end_idx]
     
-    # Create selection column
-    selected_items = []
+    # Rows for this topic/type view are built once and only sliced per page
+    frame_key = (topic_key, filter_type)
+    media_frame = st.session_state.media_frames.get(frame_key)
+    if media_frame is None:
+        media_frame = st.session_state.media_frames[frame_key] = build_media_frame(filtered_media)
     
-    # Table header
-    col1, col2, col3, col4, col5, col6 = st.columns([0.5, 2, 1, 2, 1.5, 1])
-    with col1:
-        st.write("✓")
-    with col2:
-        st.write("**File Name**")
-    with col3:
-        st.write("**Type**")
-    with col4:
-        st.write("**Size**")
-    with col5:
-        st.write("**Date**")
-    with col6:
-        st.write("**Action**")
+    # One editable table for the whole page instead of a row of widgets per file
+    page_table = st.data_editor(
+        media_frame.iloc[start_idx:end_idx],
+        column_config={"Select": st.column_config.CheckboxColumn("✓")},
+        disabled=["File Name", "Type", "Size", "Date"],
+        hide_index=True,
+        use_container_width=True
+    )
     
-    st.markdown("---")
-    
-    # Display in table format
-    for idx, media in enumerate(page_media):
-        col1, col2, col3, col4, col5, col6 = st.columns([0.5, 2, 1, 2, 1.5, 1])
-        
-        with col1:
-            selected = st.checkbox("Select", key=f"select_{media['id']}", label_visibility="collapsed")
-            if selected:
-                selected_items.append(media["id"])
-        
-        with col2:
-            st.write(media["name"])
-        
-        with col3:
-            st.write(media["type"])
-        
-        with col4:
-            st.write(format_size(media["size"]))
-        
-        with col5:
-            st.write(media["date"])
-        
-        with col6:
-            if st.button("⬇️", key=f"download_{media['id']}"):
-                progress_container = st.container()
-                channel_id, _ = parse_channel_url(channel_url)
-                # Find which topic this media belongs to
-                topic_for_media = st.session_state.selected_topic if st.session_state.selected_topic != "All" else None
-                asyncio.run(download_files(channel_id, [media["id"]], progress_container, topic_for_media, 1))
+    selected_items = [media["id"] for media, selected in zip(page_media, page_table["Select"]) if selected]
     
     # Download selected button
     if selected_items:
         st.markdown("---")
         
-        if st.button(f"📦 Download as ZIP ({len(selected_items)} files)", type="primary", use_container_width=True):
+        selected_col1, selected_col2 = st.columns(2)
+        with selected_col1:
+            download_selected = st.button(f"⬇️ Download Selected ({len(selected_items)} files)", use_container_width=True)
+        with selected_col2:
+            zip_selected = st.button(f"📦 Download as ZIP ({len(selected_items)} files)", type="primary", use_container_width=True)
+        
+        if download_selected:
+            progress_container = st.container()
+            topic_for_selected = st.session_state.selected_topic if st.session_state.selected_topic != "All" else None
+            run_async(download_files(channel_id, selected_items, progress_container, topic_for_selected, concurrent_downloads))
+        
+        if zip_selected:
             progress_container = st.container()
-            channel_id, _ = parse_channel_url(channel_url)
             
             # Create ZIP filename
-            channel_name = st.session_state.channel_info['title'].replace(' ', '_').replace('/', '_')
-            topic_suffix = f"_{st.session_state.selected_topic.replace(' ', '_')}" if st.session_state.selected_topic != "All" else ""
+            channel_name = st.session_state.channel_info['title'].translate(_TITLE_SANITIZE)
+            topic_suffix = f"_{st.session_state.selected_topic.translate(_TITLE_SANITIZE)}" if st.session_state.selected_topic != "All" else ""
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             zip_filename = f"{channel_name}{topic_suffix}_{timestamp}.zip"
             
             topic_for_selected = st.session_state.selected_topic if st.session_state.selected_topic != "All" else None
-            zip_path = asyncio.run(export_as_zip(channel_id, selected_items, zip_filename, progress_container, topic_for_selected))
+            zip_path = run_async(export_as_zip(channel_id, selected_items, zip_filename, progress_container, topic_for_selected))
             
             if zip_path and os.path.exists(zip_path):
                 # Provide download button
-                with open(zip_path, "rb") as file:
-                    st.download_button(
-                        label="⬇️ Download ZIP File",
-                        data=file,
-                        file_name=zip_filename,
-                        mime="application/zip",
-                        type="primary",
-                        use_container_width=True
-                    )
+                render_zip_download(zip_path, zip_filename, use_container_width=True)
 
 else:
     st.info("👈 Enter a channel URL in the sidebar and click 'Fetch Media' to get started!")
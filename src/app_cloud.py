@@ -3,6 +3,7 @@ Telegram Media Downloader - Cloud Deployment Version
 Multi-user support with user-provided credentials
 """
 import asyncio
+import contextlib
 import os
 import re
 import time
@@ -10,10 +11,13 @@ import zipfile
 import tempfile
 import subprocess
 import shutil
+import threading
 from pathlib import Path
 from datetime import datetime
+from types import SimpleNamespace
 import streamlit as st
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.sessions import StringSession
 from telethon.tl.types import (
     DocumentAttributeFilename,
@@ -30,19 +34,82 @@ nest_asyncio.apply()
 FFMPEG_PATHS = [
     "/usr/bin/ffmpeg",  # Linux default
     "/usr/local/bin/ffmpeg",  # Alternative Linux
-    str(Path(__file__).parent.parent / "ffmpeg" / "ffmpeg.exe"),  # Local Windows
+    *([str(Path(__file__).parent.parent / "ffmpeg" / "ffmpeg.exe")] if os.name == 'nt' else []),  # Local Windows
     "ffmpeg"  # System PATH
 ]
 
+@st.cache_resource(show_spinner=False)
 def get_ffmpeg_path():
-    """Find available FFmpeg executable"""
+    """Find available FFmpeg executable (looked up once per server process)"""
     for path in FFMPEG_PATHS:
-        if Path(path).exists() or shutil.which(path):
+        if os.path.isfile(path) or shutil.which(path):
             return path
     return None
 
 FFMPEG_PATH = get_ffmpeg_path()
 
+@st.cache_resource(show_spinner=False)
+def get_ffprobe_path():
+    """Find the ffprobe installed alongside FFmpeg"""
+    if not FFMPEG_PATH:
+        return None
+    ffmpeg_dir, ffmpeg_name = os.path.split(FFMPEG_PATH)
+    path = os.path.join(ffmpeg_dir, ffmpeg_name.replace('ffmpeg', 'ffprobe'))
+    if os.path.isfile(path) or shutil.which(path):
+        return path
+    return None
+
+FFPROBE_PATH = get_ffprobe_path()
+
+# Large documents are fetched as several interleaved streams
+DOWNLOAD_CHUNK_SIZE = 512 * 1024  # Largest request size Telethon allows
+PARALLEL_DOWNLOAD_MIN_SIZE = 10 * 1024 * 1024
+PARALLEL_DOWNLOAD_PARTS = 4
+
+# History fetches at least this long are paged as two halves at once
+PARALLEL_FETCH_MIN_LIMIT = 1000
+
+# Batches this small are served as individual files instead of a ZIP
+INDIVIDUAL_DOWNLOAD_MAX_FILES = 3
+
+# Resolved channels are reused across reruns for this long (seconds)
+ENTITY_CACHE_TTL = 300
+
+# Already-compressed formats are stored in the ZIP without deflating again
+STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp4', '.mkv', '.mov', '.webm', '.avi', '.m4v',
+    '.mp3', '.m4a', '.ogg', '.oga', '.opus', '.aac', '.flac',
+    '.pdf', '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    '.apk', '.epub', '.docx', '.xlsx', '.pptx',
+})
+
+
+def probe_audio_codec(input_path):
+    """Return the codec name of the first audio stream, or None if unknown"""
+    if not FFPROBE_PATH:
+        return None
+    
+    try:
+        result = subprocess.run(
+            [
+                FFPROBE_PATH,
+                '-v', 'error',
+                '-select_streams', 'a:0',
+                '-show_entries', 'stream=codec_name',
+                '-of', 'csv=p=0',
+                str(input_path)
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    
+    return result.stdout.strip() or None
+
 
 def convert_video_to_mp4(input_path, output_path=None, delete_original=True):
     """Convert video with Opus codec to MP4 with AAC audio using FFmpeg."""
@@ -60,12 +127,17 @@ def convert_video_to_mp4(input_path, output_path=None, delete_original=True):
         if input_path.suffix.lower() == '.mp4' and output_path == input_path:
             return str(input_path)
         
+        # AAC audio only needs a remux; anything else (Opus, Vorbis) is re-encoded
+        if probe_audio_codec(input_path) == 'aac':
+            audio_args = ['-c:a', 'copy']
+        else:
+            audio_args = ['-c:a', 'aac', '-b:a', '192k']
+        
         cmd = [
             FFMPEG_PATH,
             '-i', str(input_path),
             '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-b:a', '192k',
+            *audio_args,
             '-movflags', '+faststart',
             '-y',
             str(output_path)
@@ -90,21 +162,30 @@ def convert_video_to_mp4(input_path, output_path=None, delete_original=True):
         return str(input_path)
 
 
+# Channel URL patterns, compiled once at import
+_RE_TME_C = re.compile(r't\.me/c/(\d+)(?:/(\d+))?')
+_RE_WEB = re.compile(r'web\.telegram\.org/[^#]*#(-?\d+)')
+_RE_TME = re.compile(r't\.me/([^/?]+)(?:/(\d+))?')
+
+# Characters not allowed in file or folder names, replaced in one pass
+_FILENAME_SANITIZE = str.maketrans({c: '_' for c in '/\\:*?"<>|'})
+
+
 def parse_channel_url(url):
     """Parse Telegram URL to extract channel ID and optional topic ID."""
     url = url.strip()
     
-    c_match = re.search(r't\.me/c/(\d+)(?:/(\d+))?', url)
+    c_match = _RE_TME_C.search(url)
     if c_match:
         channel_id = int(f"-100{c_match.group(1)}")
         topic_id = int(c_match.group(2)) if c_match.group(2) else None
         return channel_id, topic_id
     
-    web_match = re.search(r'web\.telegram\.org/[^#]*#(-?\d+)', url)
+    web_match = _RE_WEB.search(url)
     if web_match:
         return int(web_match.group(1)), None
     
-    tme_match = re.search(r't\.me/([^/?]+)(?:/(\d+))?', url)
+    tme_match = _RE_TME.search(url)
     if tme_match:
         channel = tme_match.group(1)
         topic_id = int(tme_match.group(2)) if tme_match.group(2) else None
@@ -161,6 +242,58 @@ def block_if_paused():
         time.sleep(0.3)
 
 
+class AdaptiveLimiter:
+    """Concurrency limit that grows on success and halves on flood waits (AIMD)"""
+    
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.active = 0
+        self._cond = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+    
+    async def __aexit__(self, *exc_info):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+    
+    async def increase(self):
+        async with self._cond:
+            self.limit = min(self.max_limit, self.limit + 0.5)
+            self._cond.notify_all()
+    
+    async def decrease(self):
+        async with self._cond:
+            self.limit = max(1.0, self.limit * 0.5)
+
+def _async_runtime():
+    """Event loop for this browser session, kept across reruns
+    
+    A connected Telethon client stays bound to the loop it connected on, so a
+    fresh asyncio.run loop per click would drop the connection. Each user gets
+    their own loop so one user's downloads never wait on another's.
+    """
+    if 'async_runtime' not in st.session_state:
+        loop = asyncio.new_event_loop()
+        nest_asyncio.apply(loop)
+        st.session_state.async_runtime = SimpleNamespace(
+            loop=loop,
+            lock=threading.RLock(),  # A stopping rerun may still be driving the loop
+        )
+    return st.session_state.async_runtime
+
+
+def run_async(coro):
+    """Run a coroutine to completion on this session's event loop"""
+    runtime = _async_runtime()
+    with runtime.lock:
+        return runtime.loop.run_until_complete(coro)
+
+
 async def get_client(api_id, api_hash, session_string=None, phone=None, code=None):
     """Create or connect to Telegram client with user credentials"""
     try:
@@ -227,40 +360,78 @@ def get_file_info(message):
 async def fetch_media_list(client, channel_identifier, limit=10000, topic_id=None):
     """Fetch media messages from channel"""
     try:
-        channel = await client.get_entity(channel_identifier)
+        # Reruns would otherwise resolve the channel again on every fetch
+        entity_cache = st.session_state.setdefault('entity_cache', {})
+        cached = entity_cache.get(channel_identifier)
+        if cached and time.monotonic() - cached[0] < ENTITY_CACHE_TTL:
+            channel = cached[1]
+        else:
+            channel = await client.get_entity(channel_identifier)
+            entity_cache[channel_identifier] = (time.monotonic(), channel)
         
-        messages = []
-        async for message in client.iter_messages(channel, limit=limit):
-            if message.media:
-                messages.append(message)
+        async def _paginate(**kwargs):
+            return [m async for m in client.iter_messages(channel, **kwargs)]
         
-        topics_structure = {}
-        topic_names = {}
-        
-        for msg in messages:
-            topic_name = "General"
+        history = None
+        if limit >= PARALLEL_FETCH_MIN_LIMIT:
+            newest = await client.get_messages(channel, limit=1)
+            top_id = newest[0].id if newest else 0
             
-            if msg.reply_to and hasattr(msg.reply_to, 'reply_to_top_id') and msg.reply_to.reply_to_top_id:
-                tid = msg.reply_to.reply_to_top_id
+            if top_id > limit:
+                # Split the newest `limit` ids at the midpoint and page through both halves together
+                mid_id = top_id - limit // 2
+                older_limit = limit - limit // 2
+                newer, older = await asyncio.gather(
+                    _paginate(limit=limit // 2, min_id=mid_id),
+                    _paginate(limit=older_limit, offset_id=mid_id + 1),
+                )
                 
-                if tid not in topic_names:
-                    try:
-                        top_msg = await client.get_messages(channel, ids=tid)
-                        if top_msg and top_msg.message:
-                            topic_names[tid] = top_msg.message
-                        else:
-                            topic_names[tid] = f"Topic {tid}"
-                    except:
-                        topic_names[tid] = f"Topic {tid}"
+                # Deleted messages leave gaps in the newer id range; fill the
+                # shortfall from further back so the full limit is covered
+                missing = limit - len(newer) - len(older)
+                if missing > 0 and len(older) == older_limit:
+                    older += await _paginate(limit=missing, offset_id=older[-1].id)
                 
-                topic_name = topic_names[tid]
+                history = newer + older
+        
+        if history is None:
+            history = await _paginate(limit=limit)
+        messages = [m for m in history if m.media]
+        
+        # Bucket media by topic id, keeping the newest-first order
+        topic_buckets = {}  # topic id (None for General) -> messages, newest first
+        for message in messages:
+            tid = getattr(message.reply_to, 'reply_to_top_id', None) if message.reply_to else None
+            topic_buckets.setdefault(tid, []).append(message)
+        
+        # Resolve every topic name in one request, reusing names from earlier fetches
+        topic_cache = st.session_state.setdefault('topic_cache', {})
+        tids = [tid for tid in topic_buckets if tid]
+        topic_names = {tid: topic_cache[(channel.id, tid)] for tid in tids if (channel.id, tid) in topic_cache}
+        missing = [tid for tid in tids if tid not in topic_names]
+        
+        if missing:
+            try:
+                top_msgs = await client.get_messages(channel, ids=missing)
+            except Exception:
+                top_msgs = [None] * len(missing)
             
-            if topic_name not in topics_structure:
-                topics_structure[topic_name] = []
-            topics_structure[topic_name].append(msg)
+            for tid, top_msg in zip(missing, top_msgs):
+                if top_msg and top_msg.message:
+                    topic_names[tid] = topic_cache[(channel.id, tid)] = top_msg.message
+                else:
+                    topic_names[tid] = f"Topic {tid}"
         
-        for topic_name in topics_structure:
-            topics_structure[topic_name].sort(key=lambda m: m.date)
+        topics_structure = {}
+        for tid, bucket in topic_buckets.items():
+            # iter_messages yields newest first, so reversing gives oldest first without sorting
+            bucket.reverse()
+            topic_name = topic_names[tid] if tid else "General"
+            if topic_name in topics_structure:
+                # Two topics with the same title share a folder
+                topics_structure[topic_name] = sorted(topics_structure[topic_name] + bucket, key=lambda m: m.date)
+            else:
+                topics_structure[topic_name] = bucket
         
         return channel, messages, topics_structure, topic_names, topic_id
     except Exception as e:
@@ -268,8 +439,54 @@ async def fetch_media_list(client, channel_identifier, limit=10000, topic_id=Non
         return None, [], {}, {}, topic_id
 
 
-async def download_single_file(client, channel, message, folder, file_number, file_info, progress_dict, file_id, convert_videos=True):
-    """Download a single file with progress tracking"""
+def preallocate_file(f, size):
+    """Reserve all of a file's blocks up front, or just extend it where fallocate is unavailable"""
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except (AttributeError, OSError):
+        f.truncate(size)
+
+
+async def parallel_download(client, document, file_path, file_size, progress_callback, parts=PARALLEL_DOWNLOAD_PARTS):
+    """Download a document over several streams and return the number of bytes received"""
+    stride = parts * DOWNLOAD_CHUNK_SIZE
+    downloaded = 0
+    
+    with open(file_path, 'wb') as f:
+        preallocate_file(f, file_size)
+        
+        async def fetch_part(part):
+            nonlocal downloaded
+            offset = part * DOWNLOAD_CHUNK_SIZE
+            async for chunk in client.iter_download(
+                document,
+                offset=offset,
+                stride=stride,
+                chunk_size=DOWNLOAD_CHUNK_SIZE,
+                request_size=DOWNLOAD_CHUNK_SIZE,
+                file_size=file_size
+            ):
+                # No await between seek and write, so streams can't interleave here
+                f.seek(offset)
+                f.write(chunk)
+                offset += stride
+                downloaded += len(chunk)
+                progress_callback(downloaded, file_size)
+        
+        tasks = [asyncio.create_task(fetch_part(part)) for part in range(parts)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other streams (e.g. on a flood wait) before the file closes
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    return downloaded
+
+async def download_single_file(client, channel, message, folder, file_number, file_info, progress_dict, file_id, convert_videos=True, updated=None):
+    """Download a single file with progress tracking (sets `updated` on each progress sample)"""
     try:
         original_name = file_info['name']
         
@@ -277,7 +494,7 @@ async def download_single_file(client, channel, message, folder, file_number, fi
             original_name += file_info['extension']
         
         custom_name = f"{file_number}_{original_name}"
-        custom_name = custom_name.replace('/', '_').replace('\\', '_').replace(':', '_').replace('*', '_').replace('?', '_').replace('"', '_').replace('<', '_').replace('>', '_').replace('|', '_')
+        custom_name = custom_name.translate(_FILENAME_SANITIZE)
         
         file_path = os.path.join(folder, custom_name)
         start_time = time.time()
@@ -290,34 +507,59 @@ async def download_single_file(client, channel, message, folder, file_number, fi
             'status': 'downloading'
         }
         
+        last_update = time.monotonic()
+        last_bytes = 0
+        speed = 0.0
+        
         def progress_callback(current, total):
+            nonlocal last_update, last_bytes, speed
             block_if_paused()
-            elapsed = time.time() - start_time
-            progress_dict[file_id]['downloaded'] = current
-            progress_dict[file_id]['total'] = total
-            progress_dict[file_id]['speed'] = current / elapsed if elapsed > 0 else 0
+            now = time.monotonic()
+            # Telethon calls this for every chunk; sample at most every 250 ms
+            if now - last_update < 0.25 and current != total:
+                return
+            instant = (current - last_bytes) / (now - last_update) if now > last_update else 0
+            speed = 0.7 * speed + 0.3 * instant if speed else instant
+            last_update, last_bytes = now, current
+            progress_dict[file_id].update(downloaded=current, total=total, speed=speed)
+            if updated:
+                updated.set()
         
         os.makedirs(folder, exist_ok=True)
         
-        downloaded_path = await message.download_media(
-            file=folder,
-            progress_callback=progress_callback
-        )
+        if message.document and file_info['size'] >= PARALLEL_DOWNLOAD_MIN_SIZE:
+            if not os.path.splitext(file_path)[1] and message.file and message.file.ext:
+                file_path += message.file.ext
+            received = await parallel_download(client, message.document, file_path, file_info['size'], progress_callback)
+            downloaded_path = file_path
+        else:
+            downloaded_path = await message.download_media(
+                file=folder,
+                progress_callback=progress_callback
+            )
+            received = None
         
-        if downloaded_path and os.path.exists(downloaded_path):
-            actual_ext = os.path.splitext(downloaded_path)[1]
+        # One stat gives both existence and size
+        try:
+            file_stat = os.stat(downloaded_path) if downloaded_path else None
+        except FileNotFoundError:
+            file_stat = None
+        
+        if file_stat:
+            downloaded_name = os.path.basename(downloaded_path)
+            actual_ext = os.path.splitext(downloaded_name)[1]
             
             if not custom_name.endswith(actual_ext) and actual_ext:
                 custom_name = os.path.splitext(custom_name)[0] + actual_ext
-                file_path = os.path.join(folder, custom_name)
             
-            if downloaded_path != file_path:
+            # Only rename when Telethon picked a different name
+            if downloaded_name != custom_name:
+                file_path = os.path.join(folder, custom_name)
                 try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    os.rename(downloaded_path, file_path)
+                    # os.replace overwrites an existing file in the same call
+                    os.replace(downloaded_path, file_path)
                     downloaded_path = file_path
-                except Exception:
+                except OSError:
                     pass
             
             elapsed = time.time() - start_time
@@ -325,10 +567,14 @@ async def download_single_file(client, channel, message, folder, file_number, fi
             progress_dict[file_id]['time'] = elapsed
             progress_dict[file_id]['path'] = downloaded_path
             
-            actual_size = os.path.getsize(downloaded_path)
-            if actual_size < file_info['size'] * 0.95:
+            # Preallocated files are full size from the start, so count what actually arrived
+            if received is None:
+                received = file_stat.st_size
+            
+            # Document sizes are exact; photo sizes are not, so only documents are checked
+            if message.document and received != message.document.size:
                 progress_dict[file_id]['status'] = 'error'
-                progress_dict[file_id]['error'] = f'Incomplete download'
+                progress_dict[file_id]['error'] = 'Incomplete download'
                 return None
             
             if convert_videos and file_info['type'] == 'video' and FFMPEG_PATH:
@@ -344,19 +590,37 @@ async def download_single_file(client, channel, message, folder, file_number, fi
             progress_dict[file_id]['status'] = 'error'
             progress_dict[file_id]['error'] = 'File not saved'
             return None
+    except FloodWaitError:
+        # Let download_files back off and retry
+        raise
     except Exception as e:
         progress_dict[file_id]['status'] = 'error'
         progress_dict[file_id]['error'] = str(e)
         return None
 
 
+def clear_ready_files():
+    """Delete files kept on disk for individual download buttons"""
+    for file_path in st.session_state.get('ready_files', []):
+        shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+    st.session_state.ready_files = []
+
+
+def add_to_zip(zipf, file_path):
+    """Add a downloaded file to the archive, then delete it from disk"""
+    # Media is already compressed - store it as-is
+    ext = os.path.splitext(file_path)[1].lower()
+    compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    zipf.write(file_path, os.path.basename(file_path), compress_type=compress_type)
+    os.remove(file_path)
+
 async def download_files(client, channel, message_ids, topic_name, progress_container, concurrent=3, convert_videos=True):
     """Download multiple files with concurrent processing"""
     with tempfile.TemporaryDirectory() as temp_dir:
         folder = os.path.join(temp_dir, "downloads")
         
         if topic_name and topic_name != "General":
-            safe_topic_name = topic_name.replace('/', '_').replace('\\', '_').replace(':', '_')
+            safe_topic_name = topic_name.translate(_FILENAME_SANITIZE)
             folder = f"{folder}/{safe_topic_name}"
         
         os.makedirs(folder, exist_ok=True)
@@ -382,33 +646,49 @@ async def download_files(client, channel, message_ids, topic_name, progress_cont
             progress_dict = {}
             completed = 0
             downloaded_files = []
+            limiter = AdaptiveLimiter(concurrent)
+            # Set whenever progress_dict changes; the refresher redraws only then
+            updated = asyncio.Event()
             
-            for i in range(0, len(download_queue), concurrent):
-                batch = download_queue[i:i+concurrent]
-                
-                # Respect manual pause between batches
-                await wait_if_paused(overall_status)
-                
-                tasks = [
-                    asyncio.create_task(download_single_file(client, channel, msg, folder, file_num, file_info, progress_dict, file_id, convert_videos))
-                    for msg, file_num, file_info, file_id in batch
-                ]
-                
-                done_tasks = set()
-                while len(done_tasks) < len(tasks):
+            async def _bounded(msg, file_num, file_info, file_id):
+                while True:
+                    async with limiter:
+                        # Respect manual pause before starting each file
+                        await wait_if_paused(overall_status)
+                        try:
+                            result = await download_single_file(client, channel, msg, folder, file_num, file_info, progress_dict, file_id, convert_videos, updated)
+                        except FloodWaitError as e:
+                            await limiter.decrease()
+                            flood_wait = e.seconds
+                        else:
+                            await limiter.increase()
+                            return result
+                        finally:
+                            updated.set()
+                    
+                    # Wait out the flood outside the limiter, then retry the file
+                    progress_dict[file_id]['status'] = 'waiting'
+                    updated.set()
+                    await asyncio.sleep(flood_wait)
+            
+            async def _ui_refresher():
+                while True:
                     # Respect manual pause during active downloads
                     await wait_if_paused(overall_status)
-                    await asyncio.sleep(0.3)
+                    await updated.wait()
+                    updated.clear()
                     
                     active_files = []
                     total_speed = 0
                     
-                    for file_id, progress in progress_dict.items():
+                    for progress in progress_dict.values():
                         if progress['status'] == 'downloading':
                             active_files.append(f"📄 {progress['name']}: {format_size(progress['downloaded'])} / {format_size(progress['total'])}")
                             total_speed += progress.get('speed', 0)
                         elif progress['status'] == 'converting':
                             active_files.append(f"🔄 Converting {progress['name']} to MP4...")
+                        elif progress['status'] == 'waiting':
+                            active_files.append(f"⏳ {progress['name']}: rate limited, retrying soon...")
                     
                     if active_files:
                         active_downloads.markdown("\n\n".join(active_files[:concurrent + 2]))
@@ -417,17 +697,34 @@ async def download_files(client, channel, message_ids, topic_name, progress_cont
                         else:
                             speed_display.markdown("**🔄 Converting videos...**")
                     
-                    for idx, task in enumerate(tasks):
-                        if task.done() and idx not in done_tasks:
-                            done_tasks.add(idx)
-                            completed += 1
-                            result = await task
-                            if result:
-                                downloaded_files.append(result)
-                            overall_progress.progress(completed / len(download_queue))
-                            overall_status.markdown(f"**Completed:** {completed} / {len(download_queue)} files")
-                
-                await asyncio.gather(*tasks)
+                    # Changes that arrive meanwhile are drawn together in the next frame
+                    await asyncio.sleep(0.25)
+            
+            # All downloads are scheduled up front; the limiter keeps at most `concurrent` in flight
+            zip_path = os.path.join(temp_dir, "media.zip")
+            use_zip = len(download_queue) > INDIVIDUAL_DOWNLOAD_MAX_FILES
+            loop = asyncio.get_running_loop()
+            ui_task = asyncio.create_task(_ui_refresher())
+            tasks = []
+            try:
+                zip_context = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) if use_zip else contextlib.nullcontext()
+                with zip_context as zipf:
+                    tasks = [asyncio.create_task(_bounded(*item)) for item in download_queue]
+                    
+                    for coro in asyncio.as_completed(tasks):
+                        result = await coro
+                        completed += 1
+                        if result and os.path.exists(result):
+                            if zipf:
+                                # Zip each file as soon as it lands, while the rest keep downloading
+                                await loop.run_in_executor(None, add_to_zip, zipf, result)
+                            downloaded_files.append(result)
+                        overall_progress.progress(completed / len(download_queue))
+                        overall_status.markdown(f"**Completed:** {completed} / {len(download_queue)} files")
+            finally:
+                ui_task.cancel()
+                for task in tasks:
+                    task.cancel()
             
             active_downloads.empty()
             speed_display.empty()
@@ -441,24 +738,25 @@ async def download_files(client, channel, message_ids, topic_name, progress_cont
             if failed > 0:
                 st.warning(f"⚠️ {failed} file(s) failed")
             
-            # Create ZIP for download
-            if downloaded_files:
-                zip_path = os.path.join(temp_dir, "media.zip")
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for file_path in downloaded_files:
-                        if os.path.exists(file_path):
-                            zipf.write(file_path, os.path.basename(file_path))
-                
-                with open(zip_path, 'rb') as f:
-                    zip_data = f.read()
-                
+            if downloaded_files and not use_zip:
+                # A handful of files is quicker to grab directly than to unpack from a ZIP.
+                # Each download button click reruns the script and the temp folder is gone
+                # by then, so the files move to a folder that outlives it and the UI draws
+                # the buttons from their paths.
+                ready_dir = tempfile.mkdtemp(prefix="telegram_ready_")
+                st.session_state.ready_files = [shutil.move(p, ready_dir) for p in sorted(downloaded_files)]
                 st.success(f"✅ {successful} files ready!")
-                st.download_button(
-                    label="📦 Download ZIP",
-                    data=zip_data,
-                    file_name=f"telegram_media_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                    mime="application/zip"
-                )
+            
+            # Offer the ZIP for download
+            elif downloaded_files:
+                st.success(f"✅ {successful} files ready!")
+                with open(zip_path, 'rb') as f:
+                    st.download_button(
+                        label="📦 Download ZIP",
+                        data=f,
+                        file_name=f"telegram_media_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip"
+                    )
 
 
 # === STREAMLIT UI ===
@@ -485,6 +783,8 @@ if 'channel_info' not in st.session_state:
     st.session_state.channel_info = None
 if 'download_paused' not in st.session_state:
     st.session_state.download_paused = False
+if 'ready_files' not in st.session_state:
+    st.session_state.ready_files = []
 
 # Sidebar - Authentication
 with st.sidebar:
@@ -512,7 +812,7 @@ with st.sidebar:
             if session_string:
                 if st.button("🔓 Connect with Session"):
                     with st.spinner("Connecting..."):
-                        client, status = asyncio.run(get_client(int(api_id), api_hash, session_string))
+                        client, status = run_async(get_client(int(api_id), api_hash, session_string))
                         if status == "AUTHORIZED":
                             st.session_state.client = client
                             st.session_state.authenticated = True
@@ -528,7 +828,7 @@ with st.sidebar:
                 if phone and 'code_sent' not in st.session_state:
                     if st.button("📱 Send Code"):
                         with st.spinner("Sending code..."):
-                            client, status = asyncio.run(get_client(int(api_id), api_hash, None, phone))
+                            client, status = run_async(get_client(int(api_id), api_hash, None, phone))
                             if status == "CODE_SENT":
                                 st.session_state.temp_client = client
                                 st.session_state.code_sent = True
@@ -546,7 +846,7 @@ with st.sidebar:
                         with st.spinner("Verifying..."):
                             try:
                                 client = st.session_state.temp_client
-                                asyncio.run(client.sign_in(st.session_state.phone, code))
+                                run_async(client.sign_in(st.session_state.phone, code))
                                 
                                 # Save session string
                                 session_str = client.session.save()
@@ -568,7 +868,10 @@ with st.sidebar:
         st.success("✅ Authenticated")
         if st.button("🚪 Logout"):
             if st.session_state.client:
-                asyncio.run(st.session_state.client.disconnect())
+                run_async(st.session_state.client.disconnect())
+            if 'async_runtime' in st.session_state:
+                st.session_state.async_runtime.loop.close()
+            clear_ready_files()
             st.session_state.clear()
             st.rerun()
         
@@ -599,7 +902,7 @@ if st.session_state.authenticated:
         with st.spinner("Fetching media..."):
             channel_id, topic_id = parse_channel_url(channel_url)
             
-            channel, messages, topics_structure, topic_names, _ = asyncio.run(
+            channel, messages, topics_structure, topic_names, _ = run_async(
                 fetch_media_list(st.session_state.client, channel_id, fetch_limit, topic_id)
             )
             
@@ -608,6 +911,7 @@ if st.session_state.authenticated:
                 st.session_state.media_list = [get_file_info(msg) for msg in messages]
                 st.session_state.messages_map = {msg.id: msg for msg in messages}
                 st.session_state.topics_structure = topics_structure
+                clear_ready_files()
                 
                 st.success(f"✅ Fetched {len(messages)} media files from **{channel.title}**")
     
@@ -663,8 +967,9 @@ if st.session_state.authenticated:
                 st.info(f"Selected: {len(selected_ids)} files")
             with col2:
                 if st.button("📥 Download Selected", type="primary"):
+                    clear_ready_files()
                     progress_container = st.container()
-                    asyncio.run(download_files(
+                    run_async(download_files(
                         st.session_state.client,
                         st.session_state.channel_info['id'],
                         selected_ids,
@@ -673,6 +978,19 @@ if st.session_state.authenticated:
                         concurrent_downloads,
                         convert_videos
                     ))
+        
+        # Drawn on every rerun so clicking one file's button keeps the others
+        if st.session_state.ready_files:
+            st.markdown("---")
+            for file_path in st.session_state.ready_files:
+                file_name = os.path.basename(file_path)
+                with open(file_path, 'rb') as f:
+                    st.download_button(
+                        label=f"⬇️ {file_name}",
+                        data=f,
+                        file_name=file_name,
+                        key=f"file_download_{file_name}"
+                    )
 
 else:
     st.info("👈 Please authenticate using the sidebar to start downloading media")
@@ -0,0 +1,77 @@
+"""
+Tests for the local fetch cache in src/app.py
+"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def app():
+    for module in ("telethon", "streamlit", "pandas", "nest_asyncio", "dotenv"):
+        pytest.importorskip(module)
+    os.environ.setdefault("API_ID", "1")
+    os.environ.setdefault("API_HASH", "test")
+    from src import app
+    return app
+
+
+def make_message(msg_id, topic_id):
+    return SimpleNamespace(id=msg_id, media=True, reply_to=SimpleNamespace(reply_to_top_id=topic_id))
+
+
+class FakeClient:
+    """Serves a fixed channel history; topic name lookups always fail"""
+
+    def __init__(self, messages):
+        self.messages = messages  # Newest first, as Telegram returns them
+
+    async def get_entity(self, channel_identifier):
+        return SimpleNamespace(id=1, title="Test Channel")
+
+    async def get_messages(self, channel, limit=None, min_id=0, add_offset=0, ids=None, reply_to=None):
+        if ids is not None:
+            return [None] * len(ids)
+        return [m for m in self.messages if m.id > min_id][add_offset:add_offset + limit]
+
+
+@pytest.fixture
+def fake_client(app, monkeypatch, tmp_path):
+    client = FakeClient([])
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(app, "FETCH_CACHE_PATH", str(tmp_path / "fetch_cache.db"))
+    monkeypatch.setattr(app, "get_client", get_client)
+    monkeypatch.setattr(app, "get_file_info", lambda msg: {"name": f"{msg.id}.jpg", "date": msg.id})
+    return client
+
+
+def test_unresolved_topic_survives_refetch(app, fake_client):
+    fake_client.messages = [make_message(2, 7), make_message(1, 7)]
+
+    channel_info, media, topics, _, _ = asyncio.run(app.fetch_media_list("test", limit=100))
+    assert channel_info is not None
+    assert list(topics) == ["Topic_7"]
+
+    # The second fetch reads the first two rows from the cache
+    fake_client.messages.insert(0, make_message(3, 7))
+    channel_info, media, topics, _, _ = asyncio.run(app.fetch_media_list("test", limit=100))
+    assert channel_info is not None
+    assert [info["name"] for info in topics["Topic_7"]] == ["1.jpg", "2.jpg", "3.jpg"]
+
+
+def test_refetch_keeps_only_the_last_limit_messages(app, fake_client):
+    text_only = SimpleNamespace(id=3, media=None, reply_to=None)
+    fake_client.messages = [text_only, make_message(2, None), make_message(1, None)]
+
+    _, media, _, _, _ = asyncio.run(app.fetch_media_list("test", limit=3))
+    assert [info["name"] for info in media] == ["2.jpg", "1.jpg"]
+
+    # One new message pushes message 1 out of the three-message window
+    fake_client.messages.insert(0, make_message(4, None))
+    _, media, _, _, _ = asyncio.run(app.fetch_media_list("test", limit=3))
+    assert [info["name"] for info in media] == ["4.jpg", "2.jpg"]